@@ -8,6 +8,67 @@ class AIServiceConfig(BaseModel):
     temperature: float = 0.7
     max_tokens: int = 100
     system_prompt: Optional[str] = None
+
+    # Answer a user message from all roles concurrently instead of one by one
+    parallel_role_responses: bool = False
+    max_concurrent_requests: int = 4
+
+    # Upstream quota budgets, shared by all requests; override per model name
+    requests_per_minute: int = 30
+    tokens_per_minute: int = 1_000_000
+    rate_limits_by_model: Dict[str, Dict[str, int]] = {}
+
+    # Retries: exponential backoff with full jitter, capped, within an overall deadline
+    retry_max_attempts: int = 3
+    retry_base_delay: float = 1.0
+    retry_max_delay: float = 60.0
+    request_deadline: Optional[float] = 120.0
+
+    # Share one upstream call between identical requests that are in flight at once
+    coalesce_requests: bool = True
+
+    # Cache for roles that opt in with "cache_responses" (deterministic, low temperature)
+    response_cache_size: int = 256
+    response_cache_ttl: float = 600.0
+
+    # History sent as context: "full", "sliding_window", "last_turns" or "summary"
+    context_policy: str = "full"
+    context_max_tokens: int = 8000
+    context_keep_turns: int = 10
+
+    # Available-model list cached on disk so workers don't list models on every start
+    models_cache_path: Optional[str] = None
+    models_cache_ttl: float = 24 * 3600
+
+    # Model clients kept alive at once, one per model and system instruction (i.e. per role)
+    max_model_clients: int = 32
+
+    # Upstream context caching of the stable history prefix (models that support it; the
+    # API only caches prefixes of at least context_cache_min_tokens tokens)
+    context_caching: bool = False
+    context_cache_min_tokens: int = 32768
+    context_cache_ttl: float = 3600.0
+    context_cache_chunk: int = 8
+
+    # Turn-based mode: pre-generate this many likely next turns (0 disables) while at least
+    # speculation_min_spare of the model's request and token budget is unused
+    speculative_turns: int = 0
+    speculation_min_spare: float = 0.5
+    speculation_max_in_flight: int = 4
+
+    # Routing: models tried after the default one when a call fails or runs out of quota, and
+    # raced against it (hedged) when a call takes longer than its observed hedge_quantile latency
+    fallback_models: List[str] = [model.strip() for model in os.getenv("FALLBACK_MODELS", "").split(",") if model.strip()]
+    hedge_requests: bool = True
+    hedge_quantile: float = 0.95
+    hedge_min_samples: int = 20
+
+    # "gemini", or "fake" for an offline simulated model (benchmarks, local development)
+    ai_backend: str = os.getenv("AI_BACKEND", "gemini")
+    fake_latency: float = float(os.getenv("FAKE_LATENCY", "0.2"))
+    fake_tokens_per_second: float = float(os.getenv("FAKE_TOKENS_PER_SECOND", "200"))
+    fake_response_tokens: int = int(os.getenv("FAKE_RESPONSE_TOKENS", "80"))
+    fake_quota_error_rate: float = float(os.getenv("FAKE_QUOTA_ERROR_RATE", "0"))
     
     # Define available AI roles and their configurations
     AI_ROLES: Dict[str, Dict[str, Any]] = {
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import datetime
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+import google.generativeai as genai
+from .conversation import Conversation
+
+logger = logging.getLogger('ContextCache')
+
+class _Entry:
+    def __init__(self, client: Any, cached: Any, expires_at: float):
+        self.client = client
+        self.cached = cached
+        self.expires_at = expires_at
+
+class ContextCache:
+    """Upstream context caches (Gemini CachedContent) for stable conversation prefixes.
+
+    History is cached at boundaries of ``chunk`` messages. A request uses the
+    longest cached prefix of its history and sends only the messages after
+    it, so the prefix is neither re-sent nor billed at the full input rate.
+    Missing caches are created in the background once a prefix reaches
+    ``min_tokens`` (the API's minimum), so no request waits for one.
+    """
+
+    def __init__(self,
+                 configure: Callable[[], None],
+                 min_tokens: int = 32768,
+                 ttl: float = 3600.0,
+                 chunk: int = 8,
+                 max_entries: int = 32):
+        self.configure = configure
+        self.min_tokens = min_tokens
+        self.ttl = ttl
+        self.chunk = max(1, chunk)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, str], _Entry]" = OrderedDict()
+        self._pending: Set[Tuple[str, str, str]] = set()
+        # Models that rejected context caching; they are not asked again
+        self._unsupported: Set[str] = set()
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.failures = 0
+
+    def lookup(self, model: str, system_instruction: Optional[str], conversation: Optional[Conversation]) -> Optional[Tuple[Any, int]]:
+        """Return (client bound to the cache, number of cached messages) for the longest cached prefix.
+
+        Schedules creation of the cache for the current boundary if it is
+        large enough and missing.
+        """
+        if conversation is None or model in self._unsupported:
+            return None
+        boundary = len(conversation) // self.chunk * self.chunk
+        if boundary == 0:
+            return None
+        now = asyncio.get_running_loop().time()
+        hit = None
+        for length in range(boundary, 0, -self.chunk):
+            key = (model, system_instruction or "", conversation.prefix_digest(length))
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            if entry.expires_at <= now:
+                del self._entries[key]
+                continue
+            self._entries.move_to_end(key)
+            hit = (entry.client, length)
+            break
+
+        key = (model, system_instruction or "", conversation.prefix_digest(boundary))
+        if (hit is None or hit[1] < boundary) and key not in self._pending \
+                and conversation.tokens_between(0, boundary) >= self.min_tokens:
+            self._pending.add(key)
+            asyncio.create_task(self._create(key, model, system_instruction, conversation.history[:boundary]))
+
+        if hit is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return hit
+
+    async def _create(self, key: Tuple[str, str, str], model: str, system_instruction: Optional[str], contents: list) -> None:
+        def create():
+            # Only available in SDK versions with context caching
+            from google.generativeai import caching
+            self.configure()
+            return caching.CachedContent.create(
+                model=model,
+                system_instruction=system_instruction,
+                contents=contents,
+                ttl=datetime.timedelta(seconds=self.ttl),
+            )
+
+        try:
+            cached = await asyncio.to_thread(create)
+        except Exception as e:
+            self.failures += 1
+            self._unsupported.add(model)
+            logger.warning("Context caching disabled for %s: %s", model, e)
+            return
+        finally:
+            self._pending.discard(key)
+        self.created += 1
+        # Stop using the cache a little before the API expires it
+        expires_at = asyncio.get_running_loop().time() + self.ttl * 0.9
+        self._entries[key] = _Entry(genai.GenerativeModel.from_cached_content(cached), cached, expires_at)
+        while len(self._entries) > self.max_entries:
+            _, evicted = self._entries.popitem(last=False)
+            asyncio.create_task(self._delete(evicted.cached))
+
+    async def _delete(self, cached: Any) -> None:
+        try:
+            await asyncio.to_thread(cached.delete)
+        except Exception as e:
+            logger.warning("Could not delete cached content %s: %s", getattr(cached, "name", "?"), e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "pending": len(self._pending),
+            "hits": self.hits,
+            "misses": self.misses,
+            "created": self.created,
+            "failures": self.failures,
+        }
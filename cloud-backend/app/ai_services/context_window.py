@@ -0,0 +1,100 @@
+import bisect
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Awaitable, Callable
+from .conversation import Conversation
+
+logger = logging.getLogger('ContextWindow')
+
+# Summarizes messages, extending an earlier summary if one is given
+Summarizer = Callable[[Optional[str], List[Dict[str, str]]], Awaitable[str]]
+
+CONTEXT_POLICIES = ("full", "sliding_window", "last_turns", "summary")
+
+class ContextWindow:
+    """Decides which part of a conversation is sent to the model as context.
+
+    Policies:
+      - ``full``: the whole history (no limit)
+      - ``sliding_window``: the opening message plus the most recent messages
+        that fit within ``max_tokens``
+      - ``last_turns``: the opening message plus the last ``keep_turns`` messages
+      - ``summary``: like ``sliding_window``, but the dropped messages are
+        replaced by a rolling summary that is computed once and reused
+    """
+
+    def __init__(self,
+                 policy: str = "full",
+                 max_tokens: int = 8000,
+                 keep_turns: int = 10,
+                 summarizer: Optional[Summarizer] = None,
+                 summary_chunk: int = 8,
+                 max_summaries: int = 256):
+        if policy not in CONTEXT_POLICIES:
+            raise ValueError(f"Unknown context policy {policy}. Available policies: {CONTEXT_POLICIES}")
+        if policy == "summary" and summarizer is None:
+            raise ValueError("The summary context policy requires a summarizer")
+        self.policy = policy
+        self.max_tokens = max_tokens
+        self.keep_turns = keep_turns
+        self.summarizer = summarizer
+        self.summary_chunk = max(1, summary_chunk)
+        # Summaries keyed by the digest of the prefix they cover
+        self._summaries: "OrderedDict[str, str]" = OrderedDict()
+        self.max_summaries = max_summaries
+
+    def _budget_start(self, conversation: Conversation) -> int:
+        """Index of the oldest message that still fits the token budget (after the opening one)."""
+        total = len(conversation)
+        if total <= 1:
+            return total
+        budget = self.max_tokens - conversation.token_count(0)
+        # Token totals grow with the index, so the window start can be found by bisection
+        start = bisect.bisect_left(
+            range(1, total + 1), 0, key=lambda start: budget - conversation.tokens_between(start, total)
+        ) + 1
+        # Always keep the latest message, even if it alone exceeds the budget
+        return min(start, total - 1)
+
+    async def build(self, conversation: Conversation) -> Conversation:
+        """Return the conversation to send as context under the configured policy."""
+        if self.policy == "full" or len(conversation) <= 1:
+            return conversation
+        if self.policy == "last_turns":
+            start = max(1, len(conversation) - self.keep_turns)
+        else:
+            start = self._budget_start(conversation)
+        if start <= 1:
+            return conversation
+        if self.policy != "summary":
+            return conversation.window(start)
+
+        # Align the summary boundary to whole chunks (rounding up, so the budget
+        # still holds) and keep at least the latest message verbatim
+        boundary = -(-start // self.summary_chunk) * self.summary_chunk
+        boundary = min(boundary, len(conversation) - 1)
+        summary = await self._summary(conversation, boundary)
+        return conversation.window(boundary, summary={"role": "user", "content": f"Summary of the earlier discussion: {summary}"})
+
+    async def _summary(self, conversation: Conversation, boundary: int) -> str:
+        """Rolling summary of messages[1:boundary], extending the previous chunk's summary."""
+        key = conversation.prefix_digest(boundary)
+        summary = self._summaries.get(key)
+        if summary is not None:
+            self._summaries.move_to_end(key)
+            return summary
+
+        previous_boundary = boundary - self.summary_chunk
+        previous = None
+        if previous_boundary > 1:
+            previous = self._summaries.get(conversation.prefix_digest(previous_boundary))
+        if previous is not None:
+            summary = await self.summarizer(previous, conversation[previous_boundary:boundary])
+        else:
+            summary = await self.summarizer(None, conversation[1:boundary])
+        logger.info("Summarized %d earlier messages", boundary - 1)
+
+        self._summaries[key] = summary
+        while len(self._summaries) > self.max_summaries:
+            self._summaries.popitem(last=False)
+        return summary
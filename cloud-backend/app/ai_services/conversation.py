@@ -0,0 +1,103 @@
+import hashlib
+import itertools
+from collections.abc import Sequence
+from typing import Dict, List, Iterable, Optional
+import google.ai.generativelanguage as glm
+from .rate_limiter import estimate_tokens
+
+class Conversation(Sequence):
+    """Append-only conversation that keeps its Gemini-formatted history in sync.
+
+    Each message is converted to a ``glm.Content`` once, when it is appended,
+    so building a request costs O(1) conversions per turn instead of
+    re-converting the whole history. Running token estimates and a rolling
+    hash of the history are maintained alongside, per prefix.
+    """
+
+    def __init__(self, messages: Optional[Iterable[Dict[str, str]]] = None):
+        self.messages: List[Dict[str, str]] = []
+        self.history: List[glm.Content] = []
+        # Index i holds the value for the first i messages
+        self._token_totals: List[int] = [0]
+        self._digests: List[str] = [hashlib.sha256().hexdigest()]
+        for message in messages or ():
+            self.append(message)
+
+    @classmethod
+    def of(cls, context: Optional[Iterable[Dict[str, str]]]) -> "Conversation":
+        """Return ``context`` itself if it is already a Conversation, else wrap it."""
+        if isinstance(context, Conversation):
+            return context
+        return cls(context)
+
+    @staticmethod
+    def to_content(message: Dict[str, str]) -> glm.Content:
+        """Convert a message to Gemini's format (roles must be user/model)."""
+        role = "user" if message["role"] == "user" else "model"
+        return glm.Content(role=role, parts=[glm.Part(text=message["content"])])
+
+    def append(self, message: Dict[str, str]) -> None:
+        self._append_entry(message, self.to_content(message), estimate_tokens(message["content"]))
+
+    def _append_entry(self, message: Dict[str, str], content: glm.Content, tokens: int) -> None:
+        self.messages.append(message)
+        self.history.append(content)
+        self._token_totals.append(self._token_totals[-1] + tokens)
+        digest = hashlib.sha256(self._digests[-1].encode("utf-8"))
+        digest.update(message["role"].encode("utf-8") + b"\0" + message["content"].encode("utf-8"))
+        self._digests.append(digest.hexdigest())
+
+    def prefix(self, length: int) -> "Conversation":
+        """Conversation made of the first ``length`` messages, sharing converted entries."""
+        view = Conversation.__new__(Conversation)
+        view.messages = self.messages[:length]
+        view.history = self.history[:length]
+        view._token_totals = self._token_totals[:length + 1]
+        view._digests = self._digests[:length + 1]
+        return view
+
+    def window(self, start: int, head: int = 1, summary: Optional[Dict[str, str]] = None) -> "Conversation":
+        """The first ``head`` messages, an optional summary message, then messages[start:].
+
+        Converted entries and token counts are reused, so the cost depends only
+        on the size of the window, not on the length of the conversation.
+        """
+        view = Conversation()
+        head = min(head, start)
+        for index in itertools.chain(range(head), [None] if summary else [], range(start, len(self.messages))):
+            if index is None:
+                view.append(summary)
+            else:
+                view._append_entry(self.messages[index], self.history[index], self.token_count(index))
+        return view
+
+    def token_count(self, index: int) -> int:
+        """Estimated tokens of a single message."""
+        return self._token_totals[index + 1] - self._token_totals[index]
+
+    def tokens_between(self, start: int, end: int) -> int:
+        """Estimated tokens of messages[start:end]."""
+        return self._token_totals[end] - self._token_totals[start]
+
+    def prefix_digest(self, length: int) -> str:
+        """Hash of the first ``length`` messages."""
+        return self._digests[length]
+
+    @property
+    def token_estimate(self) -> int:
+        """Estimated prompt tokens for the whole history."""
+        return self._token_totals[-1]
+
+    @property
+    def digest(self) -> str:
+        """Stable hash of the history, usable as a cache key."""
+        return self._digests[-1]
+
+    def __getitem__(self, index):
+        return self.messages[index]
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def __repr__(self) -> str:
+        return f"Conversation({len(self.messages)} messages)"
@@ -0,0 +1,324 @@
+import asyncio
+import time
+import logging
+from abc import abstractmethod
+from typing import Dict, Any, List, Optional, AsyncIterator, Callable, Iterable, NamedTuple
+from .base import BaseAIService
+from .config import DEFAULT_CONVERSATION_SETTINGS
+from .conversation import Conversation
+from .context_window import ContextWindow
+from .prompts import PromptLibrary
+from .speculation import TurnPrefetcher
+from .streaming import EventCallback
+from ..role_registry import RoleStore, role_registry
+from ..metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger('ConversationService')
+
+class Generation(NamedTuple):
+    """A generated response with its token usage (estimated if the API does not report it)."""
+    text: str
+    prompt_tokens: int
+    response_tokens: int
+    cached: bool = False
+
+class ConversationService(BaseAIService):
+    """Multi-role conversations on top of a model backend's ``generate`` and ``stream_response``.
+
+    Holds everything that does not depend on how model calls are made: role
+    prompts, the context window, speculative turns and the conversation loop.
+    """
+
+    def __init__(self, config: Any, roles: Optional[RoleStore] = None, registry: Optional[MetricsRegistry] = None):
+        super().__init__(config)
+        self.role_registry = roles or role_registry
+        self.prompts = PromptLibrary()
+        self.context_window = ContextWindow(
+            policy=getattr(config, "context_policy", "full"),
+            max_tokens=getattr(config, "context_max_tokens", 8000),
+            keep_turns=getattr(config, "context_keep_turns", 10),
+            summarizer=self._summarize,
+        )
+        
+        # Speculative next turns in turn-based mode, only with spare quota
+        self.speculation_min_spare = getattr(config, "speculation_min_spare", 0.5)
+        self.prefetcher = None
+        if getattr(config, "speculative_turns", 0) > 0:
+            self.prefetcher = TurnPrefetcher(
+                self._role_reply,
+                self._has_spare_quota,
+                turns=getattr(config, "speculative_turns", 0),
+                max_in_flight=getattr(config, "speculation_max_in_flight", 4),
+                registry=registry or metrics,
+            )
+        
+        # Concurrent fan-out of role responses to a user message
+        self.parallel_role_responses = getattr(config, "parallel_role_responses", False)
+        self.request_semaphore = asyncio.Semaphore(max(1, getattr(config, "max_concurrent_requests", 4)))
+        self.conversation_latency = (registry or metrics).histogram(
+            "gemini_conversation_duration_seconds", "Duration of completed generate_conversation calls"
+        )
+
+    @abstractmethod
+    async def generate(self,
+                       prompt: str,
+                       context: Optional[Iterable[Dict[str, str]]] = None,
+                       max_tokens: Optional[int] = None,
+                       use_cache: bool = False,
+                       model: Optional[str] = None,
+                       temperature: Optional[float] = None,
+                       role: Optional[str] = None,
+                       system_instruction: Optional[str] = None) -> Generation:
+        """Generate a response with its token usage; see ``generate_response``."""
+
+    @abstractmethod
+    def stream_response(self,
+                        prompt: str,
+                        context: Optional[Iterable[Dict[str, str]]] = None,
+                        max_tokens: Optional[int] = None,
+                        use_cache: bool = False,
+                        model: Optional[str] = None,
+                        temperature: Optional[float] = None,
+                        role: Optional[str] = None,
+                        system_instruction: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream a response as text deltas while the model generates it."""
+
+    @abstractmethod
+    def clear_response_cache(self) -> None:
+        """Drop cached responses, e.g. after a role's configuration changed."""
+
+    @abstractmethod
+    def _has_spare_quota(self, role_config: Dict[str, Any]) -> bool:
+        """Whether the role's model has enough unused budget left for speculative calls."""
+
+    async def _summarize(self, previous: Optional[str], messages: List[Dict[str, str]]) -> str:
+        """Summarize messages for the context window, extending an earlier summary."""
+        transcript = "\n".join(f"{msg['role']}: {msg['content']}" for msg in messages)
+        prompt = "Summarize the key points, positions and open questions of this discussion."
+        if previous:
+            prompt += f"\n\nSummary so far:\n{previous}"
+        prompt += f"\n\nDiscussion:\n{transcript}"
+        generation = await self.generate(prompt, None, self.max_tokens, role="summary")
+        return generation.text
+
+    async def _build_context(self, context: Optional[Iterable[Dict[str, str]]]) -> Conversation:
+        """Apply the context window policy to the history sent with a request."""
+        return await self.context_window.build(Conversation.of(context))
+
+    async def generate_response(self, 
+                              prompt: str, 
+                              context: Optional[Iterable[Dict[str, str]]] = None,
+                              max_tokens: Optional[int] = None,
+                              use_cache: bool = False,
+                              model: Optional[str] = None,
+                              temperature: Optional[float] = None,
+                              role: Optional[str] = None,
+                              system_instruction: Optional[str] = None) -> str:
+        """Generate a response using Google's Gemini model with rate limiting.
+
+        ``model`` and ``temperature`` override the service defaults, e.g. with
+        a role's own settings, and ``role`` labels the call's metrics.
+        ``use_cache`` serves the response from (and stores it in) the response
+        cache; only enable it for deterministic, low-temperature roles.
+        ``system_instruction`` replaces the default one (see ``role_options``).
+        """
+        generation = await self.generate(prompt, context, max_tokens, use_cache, model, temperature, role, system_instruction)
+        return generation.text
+
+    def role_options(self, role_config: Dict[str, Any], max_tokens: Optional[int] = None) -> Dict[str, Any]:
+        """Request options for speaking as a role: its model, temperature, caching and system instruction."""
+        return {
+            "use_cache": bool(role_config.get("cache_responses")),
+            "model": role_config.get("model"),
+            "temperature": role_config.get("temperature"),
+            "role": role_config["name"],
+            "system_instruction": self.prompts.for_role(role_config).system_instruction(max_tokens or self.max_tokens),
+        }
+
+    async def _role_reply(self,
+                          role_config: Dict[str, Any],
+                          prompt: str,
+                          context: Optional[Iterable[Dict[str, str]]],
+                          max_tokens: Optional[int],
+                          on_event: Optional[EventCallback] = None) -> str:
+        """Get one role's reply from its own model, streaming deltas to ``on_event`` when given."""
+        options = self.role_options(role_config, max_tokens)
+        if on_event is None:
+            return await self.generate_response(prompt, context, max_tokens, **options)
+        parts = []
+        async for delta in self.stream_response(prompt, context, max_tokens, **options):
+            parts.append(delta)
+            await on_event({"type": "delta", "role": role_config["name"], "content": delta})
+        return "".join(parts)
+
+    async def role_turn(self,
+                        role_config: Dict[str, Any],
+                        prompt: str,
+                        context: Optional[Iterable[Dict[str, str]]],
+                        max_tokens: Optional[int],
+                        on_event: Optional[EventCallback] = None) -> str:
+        """A role's reply in turn-based mode, served from a speculated turn when one matches."""
+        if self.prefetcher is not None:
+            speculated = self.prefetcher.take(Conversation.of(context), role_config["name"], prompt, max_tokens)
+            if speculated is not None:
+                try:
+                    response = await speculated
+                except Exception as e:
+                    logger.warning("Speculated turn for %s failed, generating it again: %s", role_config["name"], e)
+                else:
+                    logger.info("Served speculated turn for %s", role_config["name"])
+                    if on_event is not None:
+                        await on_event({"type": "delta", "role": role_config["name"], "content": response})
+                    return response
+        return await self._role_reply(role_config, prompt, context, max_tokens, on_event)
+
+    def speculate_next_turns(self,
+                             conversation: Conversation,
+                             roles: List[Dict[str, Any]],
+                             prompt: Callable[[Dict[str, Any]], str],
+                             max_tokens: Optional[int] = None) -> int:
+        """Pre-generate the likeliest next turns among ``roles`` (opt-in, see speculative_turns).
+
+        ``prompt`` builds the prompt each role would be asked, and
+        ``max_tokens`` defaults to each role's own; only a later ``role_turn``
+        with the same history, prompt and length is served from them.
+        """
+        if self.prefetcher is None:
+            return 0
+        return self.prefetcher.speculate(conversation, roles, prompt, max_tokens)
+
+    async def _add_reply(self,
+                         conversation: Conversation,
+                         role_config: Dict[str, Any],
+                         response: str,
+                         on_event: Optional[EventCallback] = None) -> Dict[str, str]:
+        """Append a role's reply to the conversation and announce it."""
+        message = self.format_message("model", f"[{role_config['name']}] {response}")
+        conversation.append(message)
+        logger.info("Added response from %s", role_config['name'])
+        if on_event is not None:
+            await on_event({"type": "message", "message": message})
+        return message
+
+    async def generate_conversation(self, 
+                                 topic: str, 
+                                 roles: Dict[str, Any], 
+                                 max_turns: int = None,
+                                 max_tokens: int = None,
+                                 conversation_history: Optional[Iterable[Dict[str, str]]] = None,
+                                 parallel: Optional[bool] = None,
+                                 on_event: Optional[EventCallback] = None) -> List[Dict[str, str]]:
+        """Generate a conversation between multiple AI roles with rate limiting.
+
+        When ``parallel`` (or the service's ``parallel_role_responses`` setting) is
+        enabled, every role answers a trailing user message concurrently; the
+        responses are still appended in role order. When ``on_event`` is given,
+        replies are streamed and every text delta and completed message is
+        passed to it as soon as it is available.
+        """
+        logger.info("Starting conversation about: %s", topic)
+        started = time.perf_counter()
+
+        # Use provided settings or defaults
+        max_turns = max_turns or DEFAULT_CONVERSATION_SETTINGS["max_turns"]
+        max_tokens = max_tokens or DEFAULT_CONVERSATION_SETTINGS["max_tokens_per_response"]
+        
+        # Initialize conversation with history if provided; it keeps the
+        # Gemini-formatted history up to date as turns are appended
+        conversation = Conversation.of(conversation_history)
+        
+        # If no history, start with the topic
+        if not conversation:
+            initial_prompt = (
+                f"Let's discuss the following topic: {topic}\n\n"
+                f"Each response should be comprehensive yet concise, staying within {max_tokens} tokens. "
+                "Focus on quality and relevance while maintaining brevity."
+            )
+            conversation.append(self.format_message("user", initial_prompt))
+            logger.info("Added initial topic prompt to conversation")
+            if on_event is not None:
+                await on_event({"type": "message", "message": conversation[-1]})
+        
+        # If we have a user message at the end of the history, we should only get responses from the roles
+        # Otherwise, we'll do a full round of responses
+        if conversation and conversation[-1]["role"] == "user" and len(conversation) > 1:
+            logger.info("Processing user message with responses from all roles")
+            user_message = conversation[-1]["content"]
+            # Use all conversation history except the last message as context
+            context = conversation.prefix(len(conversation) - 1)
+
+            async def respond(role_config: Dict[str, Any]) -> str:
+                logger.info("Getting response from role: %s", role_config['name'])
+                
+                # A prompt that focuses on the user's message; the role's system
+                # prompt and length guidance go in its system instruction
+                prompt = self.prompts.for_role(role_config).reply(user_message, topic)
+                
+                async with self.request_semaphore:
+                    return await self._role_reply(role_config, prompt, context, max_tokens, on_event)
+
+            if parallel is None:
+                parallel = self.parallel_role_responses
+            if parallel:
+                # Responses are independent of each other, so request them all at once
+                responses = await asyncio.gather(*(respond(role_config) for role_config in roles.values()))
+                for role_config, response in zip(roles.values(), responses):
+                    await self._add_reply(conversation, role_config, response, on_event)
+            else:
+                # Only get one response from each role to the user's message
+                for role_config in roles.values():
+                    response = await respond(role_config)
+                    await self._add_reply(conversation, role_config, response, on_event)
+        else:
+            logger.info("Starting new round of responses")
+            # Do a full round of responses
+            current_turn = 0
+            current_topic = topic  # Start with the original topic
+            
+            while current_turn < max_turns:
+                logger.info("Starting turn %d/%d", current_turn + 1, max_turns)
+                for role_key, role_config in roles.items():
+                    logger.info("Getting response from role: %s", role_config['name'])
+                    
+                    # Use the current topic (which will be the previous speaker's output)
+                    prompt = self.prompts.for_role(role_config).perspective(current_topic)
+                    
+                    response = await self._role_reply(role_config, prompt, conversation, max_tokens, on_event)
+                    await self._add_reply(conversation, role_config, response, on_event)
+                    
+                    # Update the topic for the next speaker to be this speaker's response
+                    current_topic = response
+                
+                current_turn += 1
+        
+        logger.info("Conversation generation completed")
+        self.conversation_latency.observe(time.perf_counter() - started)
+        return conversation.messages
+
+    async def get_role_response(self,
+                              role: str,
+                              topic: str,
+                              context: List[Dict[str, str]],
+                              max_tokens: Optional[int] = None,
+                              on_event: Optional[EventCallback] = None) -> Dict[str, str]:
+        """Get a response from a specific role, streaming it to ``on_event`` if given."""
+        logger.info("Getting response from role: %s", role)
+        logger.info("Topic: %.100s", topic)
+
+        # Look up the role configuration by name or key in the shared registry
+        resolved = self.role_registry.resolve(role)
+        if not resolved:
+            error_msg = f"Role {role} not found"
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        _, role_config = resolved
+        
+        # The role's system prompt is sent as its system instruction
+        prompt = self.prompts.for_role(role_config).discuss(topic)
+        
+        response = await self.role_turn(role_config, prompt, context, max_tokens, on_event)
+        logger.info("Response generated for role: %s", role)
+        message = self.format_message("model", f"[{role_config['name']}] {response}")
+        if on_event is not None:
+            await on_event({"type": "message", "message": message})
+        return message 
@@ -0,0 +1,87 @@
+import random
+import asyncio
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, List, Optional
+from google.api_core import exceptions as api_exceptions
+from .rate_limiter import estimate_tokens
+
+# Filler vocabulary for simulated responses (roughly one token per word)
+WORDS = ("scalable", "customer", "roadmap", "latency", "budget", "risk", "market", "quality",
+         "platform", "team", "value", "deliver", "metric", "strategy", "cost", "adoption")
+
+class FakeResponse:
+    """Mimics the SDK's response: ``text``, ``usage_metadata`` and, when streamed, async iteration over chunks."""
+
+    def __init__(self, text: str, prompt_tokens: int, chunks: Optional[List[str]] = None, chunk_delay: float = 0.0):
+        self.text = text
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=estimate_tokens(text),
+        )
+        self._chunks = chunks
+        self._chunk_delay = chunk_delay
+
+    async def __aiter__(self) -> AsyncIterator["FakeResponse"]:
+        for chunk in self._chunks or [self.text]:
+            await asyncio.sleep(self._chunk_delay)
+            yield SimpleNamespace(text=chunk, usage_metadata=self.usage_metadata)
+
+class FakeGenerativeModel:
+    """Offline stand-in for ``genai.GenerativeModel`` with simulated latency, throughput and quota errors.
+
+    A call waits ``latency`` (time to first token, with +/-20% jitter), then
+    produces ``response_tokens`` (capped by max_output_tokens) at
+    ``tokens_per_second``; streamed calls deliver them in chunks of
+    ``chunk_tokens``. A ``quota_error_rate`` fraction of calls fail with
+    ResourceExhausted (429), like an exhausted upstream quota.
+    """
+
+    def __init__(self,
+                 model_name: str,
+                 system_instruction: Optional[str] = None,
+                 latency: float = 0.2,
+                 tokens_per_second: float = 200.0,
+                 response_tokens: int = 80,
+                 quota_error_rate: float = 0.0,
+                 chunk_tokens: int = 8,
+                 seed: Optional[int] = None):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.quota_error_rate = quota_error_rate
+        self.chunk_tokens = max(1, chunk_tokens)
+        self._random = random.Random(seed)
+        self.calls = 0
+
+    def _prompt_tokens(self, contents: List[Any]) -> int:
+        tokens = estimate_tokens(self.system_instruction) if self.system_instruction else 0
+        for content in contents:
+            parts = content["parts"] if isinstance(content, dict) else content.parts
+            for part in parts:
+                tokens += estimate_tokens(part if isinstance(part, str) else part.text)
+        return tokens
+
+    async def generate_content_async(self,
+                                     contents: List[Any],
+                                     generation_config: Optional[Dict[str, Any]] = None,
+                                     stream: bool = False,
+                                     **kwargs) -> FakeResponse:
+        self.calls += 1
+        await asyncio.sleep(self.latency * self._random.uniform(0.8, 1.2))
+        if self._random.random() < self.quota_error_rate:
+            raise api_exceptions.ResourceExhausted("Simulated quota exhaustion")
+
+        max_output = (generation_config or {}).get("max_output_tokens") or self.response_tokens
+        words = [self._random.choice(WORDS) for _ in range(min(self.response_tokens, max_output))]
+        seconds_per_token = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        prompt_tokens = self._prompt_tokens(contents)
+        if not stream:
+            await asyncio.sleep(len(words) * seconds_per_token)
+            return FakeResponse(" ".join(words), prompt_tokens)
+        chunks = [
+            " ".join(words[i:i + self.chunk_tokens]) + " "
+            for i in range(0, len(words), self.chunk_tokens)
+        ]
+        return FakeResponse("".join(chunks), prompt_tokens, chunks, self.chunk_tokens * seconds_per_token)
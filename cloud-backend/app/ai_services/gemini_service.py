@@ -1,258 +1,443 @@
 import google.generativeai as genai
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator, Iterable, NamedTuple, Tuple
 import asyncio
 import time
 import os
 import json
 import logging
-from datetime import datetime
-from .base import BaseAIService
-from .config import AIServiceConfig, DEFAULT_CONVERSATION_SETTINGS
-
-# Set up logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('gemini_service.log'),
-        logging.StreamHandler()
-    ]
-)
+import tempfile
+import threading
+from .config import AIServiceConfig
+from .rate_limiter import ModelRateLimits, estimate_tokens
+from .retry import RetryPolicy, DeadlineExceededError
+from .response_cache import ResponseCache
+from .conversation import Conversation
+from .model_pool import ModelPool
+from .single_flight import SingleFlight
+from .fake_backend import FakeGenerativeModel
+from .context_cache import ContextCache
+from .prompts import default_instruction
+from .conversation_service import ConversationService, Generation
+from ..role_registry import RoleStore
+from ..metrics import MetricsRegistry, metrics
+
+# Handlers and levels are configured by the application (see app/logging_config.py)
 logger = logging.getLogger('GeminiService')
 
-def load_roles() -> Dict:
-    """Load roles from configuration file."""
-    try:
-        config_file = os.path.join(os.path.dirname(__file__), "..", "config", "roles.json")
-        if os.path.exists(config_file):
-            with open(config_file, 'r') as f:
-                return json.load(f)
-        return {"roles": {}}
-    except Exception as e:
-        logger.error(f"Error loading roles: {e}")
-        return {"roles": {}}
-
-class GeminiService(BaseAIService):
-    def __init__(self, config: Dict[str, Any]):
-        super().__init__(config)
+# Where the list of available models is cached between worker starts
+DEFAULT_MODEL_CACHE_PATH = os.path.join(tempfile.gettempdir(), "gemini_models.json")
+
+async def _run_in_daemon_thread(fn):
+    """Run a blocking call in a daemon thread, so an unreachable API cannot hold up shutdown."""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def settle(setter, value):
+        if not future.done():
+            setter(value)
+
+    def run():
+        try:
+            result = fn()
+        except BaseException as e:
+            loop.call_soon_threadsafe(settle, future.set_exception, e)
+        else:
+            loop.call_soon_threadsafe(settle, future.set_result, result)
+
+    threading.Thread(target=run, daemon=True).start()
+    return await future
+
+class PreparedRequest(NamedTuple):
+    """Everything needed to send (or look up in the cache) one model request."""
+    model: str
+    contents: List[Any]
+    generation_config: Dict[str, Any]
+    tokens: int
+    cache_key: str
+    # Role name, for metrics only
+    role: str = ""
+    system_instruction: Optional[str] = None
+    # History sent with the request (contents minus the prompt), for context caching
+    conversation: Optional[Conversation] = None
+
+def _usage(request: PreparedRequest, response: Any, text: str) -> Tuple[int, int]:
+    """Prompt and response tokens from the response's usage metadata, or estimates."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None and getattr(usage, "prompt_token_count", None):
+        return usage.prompt_token_count, usage.candidates_token_count
+    return request.tokens - request.generation_config["max_output_tokens"], estimate_tokens(text)
+
+class GeminiService(ConversationService):
+    def __init__(self, config: Dict[str, Any], roles: Optional[RoleStore] = None, registry: Optional[MetricsRegistry] = None):
+        super().__init__(config, roles, registry)
+        self._register_metrics(registry or metrics)
         self.api_key = AIServiceConfig().GOOGLE_API_KEY
-        if not self.api_key:
-            raise ValueError("GOOGLE_API_KEY is required")
         
-        # Configure the API
-        genai.configure(api_key=self.api_key)
-        
-        # Get available models
-        available_models = [model.name for model in genai.list_models()]
-        if self.model not in available_models:
-            raise ValueError(f"Model {self.model} not available. Available models: {available_models}")
-        
-        # Initialize the model
-        self.model = genai.GenerativeModel(self.model)
+        # Nothing here touches the network: the API is configured and model
+        # clients created on first use, and the model is validated in the background
+        self.model_name = self.normalize_model(self.model)
+        # One client per model and system instruction, shared by every request of a role
+        self.backend = getattr(config, "ai_backend", "gemini")
+        if self.backend not in ("gemini", "fake"):
+            raise ValueError(f"Unknown AI backend {self.backend}. Available backends: gemini, fake")
+        self.fake_settings = {
+            "latency": getattr(config, "fake_latency", 0.2),
+            "tokens_per_second": getattr(config, "fake_tokens_per_second", 200.0),
+            "response_tokens": getattr(config, "fake_response_tokens", 80),
+            "quota_error_rate": getattr(config, "fake_quota_error_rate", 0.0),
+        }
+        factory = self._create_fake_model if self.backend == "fake" else self._create_model
+        self.models = ModelPool(factory, getattr(config, "max_model_clients", 32))
+        # Stable history prefixes cached upstream, so each turn only sends what is new
+        self.context_cache = None
+        if getattr(config, "context_caching", False) and self.backend == "gemini":
+            self.context_cache = ContextCache(
+                self._configure,
+                min_tokens=getattr(config, "context_cache_min_tokens", 32768),
+                ttl=getattr(config, "context_cache_ttl", 3600.0),
+                chunk=getattr(config, "context_cache_chunk", 8),
+            )
+        self._fallback_models = set()
+        self._configured = False
+        self.model_cache_path = getattr(config, "models_cache_path", None) or DEFAULT_MODEL_CACHE_PATH
+        self.model_cache_ttl = getattr(config, "models_cache_ttl", 24 * 3600)
+        self.model_available: Optional[bool] = None
+        self.available_models: List[str] = []
         
-        # Rate limiting
-        self.last_request_time = 0
-        self.min_request_interval = 2  # Minimum seconds between requests
-        self.max_retries = 3
-        self.retry_delay = 60  # Default retry delay in seconds
+        # Rate limiting: token buckets per model, shared by all concurrent requests
+        self.rate_limits = ModelRateLimits(
+            getattr(config, "requests_per_minute", 30),
+            getattr(config, "tokens_per_minute", 1_000_000),
+            getattr(config, "rate_limits_by_model", None),
+        )
+        self.response_cache = ResponseCache(
+            max_entries=getattr(config, "response_cache_size", 256),
+            ttl=getattr(config, "response_cache_ttl", 600.0),
+        )
+        # Identical requests in flight at the same time share one upstream call
+        self.single_flight = SingleFlight() if getattr(config, "coalesce_requests", True) else None
+        self.retry_policy = RetryPolicy(
+            max_attempts=getattr(config, "retry_max_attempts", 3),
+            base_delay=getattr(config, "retry_base_delay", 1.0),
+            max_delay=getattr(config, "retry_max_delay", 60.0),
+            deadline=getattr(config, "request_deadline", 120.0),
+        )
         
-        logger.info(f"GeminiService initialized with model: {self.model}")
-
-    async def _wait_for_rate_limit(self):
-        """Wait if necessary to respect rate limits."""
-        current_time = time.time()
-        time_since_last_request = current_time - self.last_request_time
-        if time_since_last_request < self.min_request_interval:
-            wait_time = self.min_request_interval - time_since_last_request
-            logger.debug(f"Rate limiting: waiting {wait_time:.2f} seconds")
-            await asyncio.sleep(wait_time)
-        self.last_request_time = time.time()
-
-    async def generate_response(self, 
-                              prompt: str, 
-                              context: List[Dict[str, str]] = None,
-                              max_tokens: Optional[int] = None) -> str:
-        """Generate a response using Google's Gemini model with rate limiting."""
-        # Simplified logging - only show topic and output
-        logger.info(f"Topic: {prompt}")
+        logger.info("GeminiService initialized with model: %s", self.model_name)
 
-        for attempt in range(self.max_retries):
-            try:
-                await self._wait_for_rate_limit()
-                
-                # Format the conversation history if context is provided
-                history = []
-                if context:
-                    for msg in context:
-                        # Convert roles to user/model as required by Gemini
-                        role = "user" if msg["role"] == "user" else "model"
-                        history.append({
-                            "role": role,
-                            "parts": [msg["content"]]
-                        })
-
-                # Use provided max_tokens or default from config
-                max_tokens = max_tokens or self.config.get("max_tokens", 300)
-
-                # Add max_tokens instruction to the prompt
-                enhanced_prompt = (
-                    f"{prompt}\n\n"
-                    f"IMPORTANT: Please provide a comprehensive response within {max_tokens} tokens. "
-                    "Your response should:\n"
-                    "1. Cover all important aspects of the topic\n"
-                    "2. Stay concise and focused\n"
-                    "3. Prioritize quality and relevance\n"
-                    "4. Maintain clarity while being brief"
-                )
+    def _configure(self) -> None:
+        """Configure the Gemini API key once, on first use."""
+        if not self._configured:
+            if not self.api_key:
+                raise ValueError("GOOGLE_API_KEY is required")
+            genai.configure(api_key=self.api_key)
+            self._configured = True
+
+    def _register_metrics(self, registry: MetricsRegistry) -> None:
+        """Create (or look up) the service's metrics in ``registry``."""
+        self.upstream_latency = registry.histogram(
+            "gemini_request_duration_seconds", "Upstream model call latency (to the first chunk when streaming)", ["model", "role"]
+        )
+        self.upstream_requests = registry.counter(
+            "gemini_requests_total", "Upstream model calls by outcome", ["model", "role", "outcome"]
+        )
+        self.retries = registry.counter("gemini_retries_total", "Retried model calls by reason", ["model", "reason"])
+        self.quota_errors = registry.counter("gemini_quota_errors_total", "429 / quota exhausted responses", ["model"])
+        self.limiter_wait = registry.histogram(
+            "gemini_rate_limit_wait_seconds", "Time spent waiting on the client-side rate limiter", ["model"]
+        )
+        self.prompt_tokens = registry.counter(
+            "gemini_prompt_tokens_total", "Prompt tokens (from usage_metadata, else estimated)", ["model", "role"]
+        )
+        self.response_tokens = registry.counter(
+            "gemini_response_tokens_total", "Response tokens (from usage_metadata, else estimated)", ["model", "role"]
+        )
+
+    def _record_usage(self, request: "PreparedRequest", prompt_tokens: int, response_tokens: int) -> None:
+        self.prompt_tokens.inc(prompt_tokens, model=request.model, role=request.role)
+        self.response_tokens.inc(response_tokens, model=request.model, role=request.role)
+
+    @staticmethod
+    def normalize_model(model: str) -> str:
+        """Full API name of a model ("gemini-x" -> "models/gemini-x")."""
+        return model if model.startswith("models/") else f"models/{model}"
+
+    def _create_model(self, model_name: str, system_instruction: Optional[str] = None):
+        """Create the client for one model and system instruction (used by the model pool)."""
+        self._configure()
+        return genai.GenerativeModel(model_name, system_instruction=system_instruction)
+
+    def _create_fake_model(self, model_name: str, system_instruction: Optional[str] = None) -> FakeGenerativeModel:
+        """Create a simulated model client (AI_BACKEND=fake); never touches the network."""
+        return FakeGenerativeModel(model_name, system_instruction, **self.fake_settings)
+
+    def _resolve_model(self, model: Optional[str]) -> str:
+        """Model to use for a request: the role's model if available, else the default one."""
+        if not model:
+            return self.model_name
+        model = self.normalize_model(model)
+        if self.available_models and model not in self.available_models:
+            if model not in self._fallback_models:
+                self._fallback_models.add(model)
+                logger.warning("Model %s not available, using %s", model, self.model_name)
+            return self.model_name
+        return model
+
+    def _generative_model(self, model_name: str, system_instruction: Optional[str] = None):
+        """Return the pooled client for a model and system instruction, creating it on first use."""
+        if model_name == self.model_name and self.model_available is False:
+            raise ValueError(f"Model {self.model_name} not available. Available models: {self.available_models}")
+        return self.models.get(model_name, system_instruction)
+
+    def _client_for(self, request: PreparedRequest) -> Tuple[Any, List[Any]]:
+        """Client and contents to send: with a cached history prefix, only the messages after it."""
+        if self.context_cache is not None:
+            hit = self.context_cache.lookup(request.model, request.system_instruction, request.conversation)
+            if hit is not None:
+                client, cached_messages = hit
+                return client, request.contents[cached_messages:]
+        return self._generative_model(request.model, request.system_instruction), request.contents
+
+    def _read_model_cache(self) -> Optional[List[str]]:
+        """Available model names from the on-disk cache, if still fresh."""
+        try:
+            with open(self.model_cache_path, 'r') as f:
+                cached = json.load(f)
+            if time.time() - cached["fetched_at"] < self.model_cache_ttl:
+                return cached["models"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        return None
+
+    def _fetch_models(self) -> List[str]:
+        """List available models from the API and cache the result on disk (blocking)."""
+        self._configure()
+        models = [model.name for model in genai.list_models()]
+        try:
+            os.makedirs(os.path.dirname(self.model_cache_path), exist_ok=True)
+            with open(self.model_cache_path, 'w') as f:
+                json.dump({"fetched_at": time.time(), "models": models}, f)
+        except OSError as e:
+            logger.warning("Could not write model cache: %s", e)
+        return models
+
+    async def validate_model(self) -> Optional[bool]:
+        """Check that the configured model exists, without blocking the event loop.
+
+        Uses the on-disk model list while it is fresh; otherwise lists models
+        in a worker thread. Failures are logged and leave the service usable.
+        """
+        if self.backend == "fake":
+            self.model_available = True
+            return True
+        try:
+            models = await asyncio.to_thread(self._read_model_cache)
+            if models is None:
+                models = await _run_in_daemon_thread(self._fetch_models)
+        except Exception as e:
+            logger.warning("Could not validate model %s: %s", self.model_name, e)
+            return None
+        self.available_models = models
+        self.model_available = self.model_name in models
+        if self.model_available:
+            logger.info("Model %s is available", self.model_name)
+        else:
+            logger.error("Model %s not available. Available models: %s", self.model_name, models)
+        return self.model_available
 
-                # Generate the response
-                response = await self.model.generate_content_async(
-                    contents=history + [{"role": "user", "parts": [enhanced_prompt]}],
-                    generation_config={
-                        "temperature": self.temperature,
-                        "max_output_tokens": max_tokens,
-                    }
+    def stats(self) -> Dict[str, Any]:
+        """Runtime statistics: response cache, rate limiter, model pool, request coalescing and context cache state."""
+        return {
+            "response_cache": self.response_cache.stats(),
+            "rate_limits": self.rate_limits.state(),
+            "model_pool": self.models.stats(),
+            "single_flight": self.single_flight.stats() if self.single_flight else None,
+            "context_cache": self.context_cache.stats() if self.context_cache else None,
+            "speculation": self.prefetcher.stats() if self.prefetcher else None,
+        }
+
+    def clear_response_cache(self) -> None:
+        """Drop cached responses, e.g. after a role's configuration changed."""
+        self.response_cache.clear()
+
+    def _has_spare_quota(self, role_config: Dict[str, Any]) -> bool:
+        """Whether the role's model has enough unused budget left for speculative calls."""
+        limiter = self.rate_limits.for_model(self._resolve_model(role_config.get("model")))
+        if limiter.waiting:
+            return False
+        spare = self.speculation_min_spare
+        return (limiter.requests.available() >= spare * limiter.requests.capacity
+                and limiter.tokens.available() >= spare * limiter.tokens.capacity)
+
+    async def _wait_for_rate_limit(self, model_name: str, tokens: int = 0) -> float:
+        """Wait until the model's request and token budgets allow another call."""
+        waited = await self.rate_limits.for_model(model_name).acquire(tokens)
+        self.limiter_wait.observe(waited, model=model_name)
+        if waited:
+            logger.debug("Rate limiting: waited %.2f seconds", waited)
+        return waited
+
+    def _prepare_request(self,
+                         prompt: str,
+                         context: Optional[Iterable[Dict[str, str]]] = None,
+                         max_tokens: Optional[int] = None,
+                         model: Optional[str] = None,
+                         temperature: Optional[float] = None,
+                         role: Optional[str] = None,
+                         system_instruction: Optional[str] = None) -> PreparedRequest:
+        """Build the request for a prompt, using the given model and temperature or the defaults.
+
+        ``context`` may be a Conversation, whose pre-converted history is used
+        as is; plain message lists are converted here. The system instruction
+        (a role's, or the service default with length guidance) is sent
+        separately from the contents, so the prompt carries only new content.
+        """
+        conversation = Conversation.of(context)
+
+        # Use provided max_tokens or default from config
+        max_tokens = max_tokens or self.max_tokens
+        if system_instruction is None:
+            system_instruction = default_instruction(self.system_prompt, max_tokens)
+
+        # Budget for the whole request: instruction, history, prompt and the longest allowed reply
+        request_tokens = (
+            estimate_tokens(system_instruction) + conversation.token_estimate + estimate_tokens(prompt) + max_tokens
+        )
+
+        model_name = self._resolve_model(model)
+        contents = [*conversation.history, {"role": "user", "parts": [prompt]}]
+        generation_config = {
+            "temperature": self.temperature if temperature is None else temperature,
+            "max_output_tokens": max_tokens,
+        }
+        cache_key = self.response_cache.make_key(
+            model_name, generation_config, [system_instruction, conversation.digest, prompt]
+        )
+        return PreparedRequest(
+            model_name, contents, generation_config, request_tokens, cache_key, role or "", system_instruction, conversation
+        )
+
+    async def _request_with_retries(self, request: PreparedRequest, stream: bool = False):
+        """Send a rate-limited request to its model, retrying per the retry policy."""
+        async def attempt_request():
+            await self._wait_for_rate_limit(request.model, request.tokens)
+            client, contents = self._client_for(request)
+            with self.upstream_latency.time(model=request.model, role=request.role):
+                return await client.generate_content_async(
+                    contents=contents,
+                    generation_config=request.generation_config,
+                    stream=stream
                 )
-                
-                # Simplified logging - only show output
-                logger.info(f"Output: {response.text[:100]}{'...' if len(response.text) > 100 else ''}")
-                return response.text
+
+        policy = self.retry_policy
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + policy.deadline if policy.deadline else None
+        for attempt in range(policy.max_attempts):
+            try:
+                remaining = None if deadline is None else deadline - loop.time()
+                if remaining is not None and remaining <= 0:
+                    raise DeadlineExceededError(f"Request deadline of {policy.deadline}s exceeded")
+                response = await asyncio.wait_for(attempt_request(), remaining)
+                self.upstream_requests.inc(model=request.model, role=request.role, outcome="success")
+                if not stream:
+                    # Streamed usage is recorded once the stream has been consumed
+                    self._record_usage(request, *_usage(request, response, response.text))
+                return response
+            except DeadlineExceededError as e:
+                logger.error("%s", e)
+                self.upstream_requests.inc(model=request.model, role=request.role, outcome="deadline")
+                raise Exception(f"Error generating response: {e}") from e
             except Exception as e:
-                error_str = str(e)
-                logger.error(f"Error generating response (attempt {attempt + 1}/{self.max_retries}): {error_str}")
-                if "429" in error_str and "quota" in error_str.lower():
-                    if attempt < self.max_retries - 1:
-                        logger.warning(f"Rate limit hit, waiting {self.retry_delay} seconds before retry...")
-                        await asyncio.sleep(self.retry_delay)
+                error_str = str(e) or type(e).__name__
+                logger.error("Error generating response (attempt %d/%d): %s", attempt + 1, policy.max_attempts, error_str)
+                quota_error = policy.is_quota_error(e)
+                if quota_error:
+                    self.quota_errors.inc(model=request.model)
+                if policy.is_retryable(e) and attempt < policy.max_attempts - 1:
+                    delay = policy.delay_for(e, attempt)
+                    if deadline is None or loop.time() + delay < deadline:
+                        kind = "Rate limit hit" if quota_error else "Transient error"
+                        logger.warning("%s, waiting %.2f seconds before retry...", kind, delay)
+                        self.retries.inc(model=request.model, reason="quota" if quota_error else "transient")
+                        await asyncio.sleep(delay)
                         continue
-                raise Exception(f"Error generating response: {error_str}")
-
-    async def generate_conversation(self, 
-                                 topic: str, 
-                                 roles: Dict[str, Any], 
-                                 max_turns: int = None,
-                                 max_tokens: int = None,
-                                 conversation_history: List[Dict[str, str]] = None) -> List[Dict[str, str]]:
-        """Generate a conversation between multiple AI roles with rate limiting."""
-        logger.info(f"Starting conversation about: {topic}")
-
-        # Use provided settings or defaults
-        max_turns = max_turns or DEFAULT_CONVERSATION_SETTINGS["max_turns"]
-        max_tokens = max_tokens or DEFAULT_CONVERSATION_SETTINGS["max_tokens_per_response"]
-        
-        # Initialize conversation with history if provided
-        conversation = conversation_history or []
-        
-        # If no history, start with the topic
-        if not conversation:
-            initial_prompt = (
-                f"Let's discuss the following topic: {topic}\n\n"
-                f"Each response should be comprehensive yet concise, staying within {max_tokens} tokens. "
-                "Focus on quality and relevance while maintaining brevity."
-            )
-            conversation.append(self.format_message("user", initial_prompt))
-            logger.info("Added initial topic prompt to conversation")
-        
-        # If we have a user message at the end of the history, we should only get responses from the roles
-        # Otherwise, we'll do a full round of responses
-        if conversation and conversation[-1]["role"] == "user" and len(conversation) > 1:
-            logger.info("Processing user message with responses from all roles")
-            # Only get one response from each role to the user's message
-            for role_key, role_config in roles.items():
-                logger.info(f"Getting response from role: {role_config['name']}")
-                
-                # Create a prompt that focuses on the user's message
-                user_message = conversation[-1]["content"]
-                prompt = (
-                    f"As the {role_config['name']}, please respond to this question/statement: {user_message}\n\n"
-                    f"Consider the context of our discussion about {topic} and the conversation history so far. "
-                    f"Your response should be comprehensive yet concise, staying within {max_tokens} tokens. "
-                    "Focus on quality and relevance while maintaining brevity."
-                )
-                
-                # Include role's system prompt in the context
-                if role_config.get('system_prompt'):
-                    prompt = f"{role_config['system_prompt']}\n\n{prompt}"
-                
-                # Use all conversation history except the last message as context
-                context = conversation[:-1] if len(conversation) > 1 else []
-                response = await self.generate_response(prompt, context, max_tokens)
-                conversation.append(self.format_message("model", f"[{role_config['name']}] {response}"))
-                logger.info(f"Added response from {role_config['name']}")
-                
-                # Add a small delay between responses
-                await asyncio.sleep(1)
+                    logger.warning("Retry would exceed the request deadline, giving up")
+                self.upstream_requests.inc(model=request.model, role=request.role, outcome="error")
+                raise Exception(f"Error generating response: {error_str}") from e
+
+    async def generate(self,
+                       prompt: str,
+                       context: Optional[Iterable[Dict[str, str]]] = None,
+                       max_tokens: Optional[int] = None,
+                       use_cache: bool = False,
+                       model: Optional[str] = None,
+                       temperature: Optional[float] = None,
+                       role: Optional[str] = None,
+                       system_instruction: Optional[str] = None,
+                       build_context: bool = True) -> Generation:
+        """Generate a response with its token usage; see ``generate_response``.
+
+        Without ``build_context`` the context is sent as given, for callers
+        that have already applied the context window policy.
+        """
+        # Simplified logging - only show topic and output
+        logger.info("Topic: %.100s", prompt)
+
+        if build_context:
+            context = await self._build_context(context)
+        request = self._prepare_request(prompt, context, max_tokens, model, temperature, role, system_instruction)
+        if use_cache:
+            cached = self.response_cache.get(request.cache_key)
+            if cached is not None:
+                logger.info("Output served from response cache")
+                return Generation(cached, *_usage(request, None, cached), cached=True)
+
+        if self.single_flight is not None:
+            response = await self.single_flight.run(request.cache_key, lambda: self._request_with_retries(request))
         else:
-            logger.info("Starting new round of responses")
-            # Do a full round of responses
-            current_turn = 0
-            current_topic = topic  # Start with the original topic
-            
-            while current_turn < max_turns:
-                logger.info(f"Starting turn {current_turn + 1}/{max_turns}")
-                for role_key, role_config in roles.items():
-                    logger.info(f"Getting response from role: {role_config['name']}")
-                    
-                    # Use the current topic (which will be the previous speaker's output)
-                    prompt = (
-                        f"As the {role_config['name']}, please provide your perspective on: {current_topic}\n\n"
-                        f"Consider the conversation history so far. "
-                        f"Your response should be comprehensive yet concise, staying within {max_tokens} tokens. "
-                        "Focus on quality and relevance while maintaining brevity."
-                    )
-                    
-                    # Include role's system prompt in the context
-                    if role_config.get('system_prompt'):
-                        prompt = f"{role_config['system_prompt']}\n\n{prompt}"
-                    
-                    response = await self.generate_response(prompt, conversation, max_tokens)
-                    conversation.append(self.format_message("model", f"[{role_config['name']}] {response}"))
-                    logger.info(f"Added response from {role_config['name']}")
-                    
-                    # Update the topic for the next speaker to be this speaker's response
-                    current_topic = response
-                    
-                    # Add a small delay between responses
-                    await asyncio.sleep(1)
-                
-                current_turn += 1
-        
-        logger.info("Conversation generation completed")
-        return conversation
-
-    async def get_role_response(self,
-                              role: str,
-                              topic: str,
-                              context: List[Dict[str, str]],
-                              max_tokens: Optional[int] = None) -> Dict[str, str]:
-        """Get a response from a specific role."""
-        logger.info(f"Getting response from role: {role}")
-        logger.info(f"Topic: {topic[:100]}{'...' if len(topic) > 100 else ''}")
-
-        # Load roles to get the role configuration
-        roles_data = load_roles()
-        role_config = None
-        
-        # Try to find the role by name or key
-        for key, config in roles_data["roles"].items():
-            if config["name"] == role or key == role:
-                role_config = config
-                break
-        
-        if not role_config:
-            error_msg = f"Role {role} not found"
-            logger.error(error_msg)
-            raise ValueError(error_msg)
-        
-        # Create a prompt that includes the role's system prompt and context
-        prompt = (
-            f"As the {role_config['name']}, please provide your perspective on the topic: {topic}, "
-            "considering the entire discussion so far."
-        )
-        
-        if role_config.get('system_prompt'):
-            prompt = f"{role_config['system_prompt']}\n\n{prompt}"
-        
-        response = await self.generate_response(prompt, context, max_tokens)
-        logger.info(f"Response generated for role: {role}")
-        return self.format_message("model", f"[{role_config['name']}] {response}") 
\ No newline at end of file
+            response = await self._request_with_retries(request)
+
+        # Simplified logging - only show output
+        logger.info("Output: %.100s", response.text)
+        if use_cache:
+            self.response_cache.set(request.cache_key, response.text)
+        return Generation(response.text, *_usage(request, response, response.text))
+
+    async def stream_response(self,
+                              prompt: str,
+                              context: Optional[Iterable[Dict[str, str]]] = None,
+                              max_tokens: Optional[int] = None,
+                              use_cache: bool = False,
+                              model: Optional[str] = None,
+                              temperature: Optional[float] = None,
+                              role: Optional[str] = None,
+                              system_instruction: Optional[str] = None,
+                              build_context: bool = True) -> AsyncIterator[str]:
+        """Stream a response as text deltas while the model generates it.
+
+        Retries apply only until the stream is established; an error after the
+        first chunk is raised to the caller. A cached response is yielded whole.
+        ``build_context`` is as for ``generate``.
+        """
+        logger.info("Topic (streaming): %.100s", prompt)
+
+        if build_context:
+            context = await self._build_context(context)
+        request = self._prepare_request(prompt, context, max_tokens, model, temperature, role, system_instruction)
+        if use_cache:
+            cached = self.response_cache.get(request.cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+        response = await self._request_with_retries(request, stream=True)
+        parts = []
+        chunk = None
+        async for chunk in response:
+            if chunk.text:
+                parts.append(chunk.text)
+                yield chunk.text
+        text = "".join(parts)
+        self._record_usage(request, *_usage(request, chunk, text))
+        if use_cache:
+            self.response_cache.set(request.cache_key, text)
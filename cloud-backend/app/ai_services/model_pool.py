@@ -0,0 +1,37 @@
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Hashable
+
+class ModelPool:
+    """Bounded pool of model clients, created lazily and reused per key.
+
+    When the pool is full the least recently used client is dropped.
+    """
+
+    def __init__(self, factory: Callable[..., Any], max_size: int = 8):
+        self.factory = factory
+        self.max_size = max(1, max_size)
+        self._clients: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.created = 0
+        self.evicted = 0
+
+    def get(self, *key: Hashable) -> Any:
+        """Return the client for ``key`` (passed to the factory), creating it if needed."""
+        client = self._clients.get(key)
+        if client is None:
+            client = self.factory(*key)
+            self.created += 1
+            self._clients[key] = client
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+                self.evicted += 1
+        else:
+            self._clients.move_to_end(key)
+        return client
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._clients),
+            "max_size": self.max_size,
+            "created": self.created,
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,79 @@
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+# Sent once per request in the system instruction instead of after every prompt
+LENGTH_GUIDANCE = (
+    "Keep every response within {max_tokens} tokens. Cover the important aspects of the topic, "
+    "stay concise and focused, prioritize quality and relevance, and remain clear while being brief."
+)
+
+def default_instruction(system_prompt: Optional[str], max_tokens: int) -> str:
+    """System instruction for requests that are not made on behalf of a role."""
+    guidance = LENGTH_GUIDANCE.format(max_tokens=max_tokens)
+    return f"{system_prompt}\n\n{guidance}" if system_prompt else guidance
+
+class RolePrompts:
+    """A role's prompt templates, compiled once and reused for every turn.
+
+    The role's identity, system prompt and length guidance form the
+    system instruction, so each turn's prompt carries only the new content.
+    """
+
+    def __init__(self, role_config: Dict[str, Any]):
+        self.name = role_config["name"]
+        identity = f"You are acting as a {self.name}"
+        if role_config.get("description"):
+            identity += f" - {role_config['description']}"
+        self._instruction_prefix = identity
+        if role_config.get("system_prompt"):
+            self._instruction_prefix += f"\n\n{role_config['system_prompt']}"
+        self._instructions: Dict[int, str] = {}
+        # The name is baked into the templates, so escape it for str.format
+        name = self.name.replace("{", "{{").replace("}", "}}")
+        self._perspective = f"As the {name}, please provide your perspective on: {{topic}}"
+        self._reply = (
+            f"As the {name}, please respond to this question/statement: {{message}}\n\n"
+            "Consider the context of our discussion about {topic} and the conversation history so far."
+        )
+        self._discuss = (
+            f"As the {name}, please provide your perspective on the topic: {{topic}}, "
+            "considering the entire discussion so far."
+        )
+
+    def system_instruction(self, max_tokens: int) -> str:
+        instruction = self._instructions.get(max_tokens)
+        if instruction is None:
+            instruction = self._instructions[max_tokens] = (
+                f"{self._instruction_prefix}\n\n{LENGTH_GUIDANCE.format(max_tokens=max_tokens)}"
+            )
+        return instruction
+
+    def perspective(self, topic: str) -> str:
+        """Prompt for a turn in a round: respond to the previous speaker's output."""
+        return self._perspective.format(topic=topic)
+
+    def reply(self, message: str, topic: str) -> str:
+        """Prompt for answering a user message."""
+        return self._reply.format(message=message, topic=topic)
+
+    def discuss(self, topic: str) -> str:
+        """Prompt for a single requested turn on a topic."""
+        return self._discuss.format(topic=topic)
+
+class PromptLibrary:
+    """Compiled RolePrompts per role, rebuilt only when the role's prompt fields change."""
+
+    def __init__(self, max_roles: int = 256):
+        self.max_roles = max_roles
+        self._roles: "OrderedDict[Tuple, RolePrompts]" = OrderedDict()
+
+    def for_role(self, role_config: Dict[str, Any]) -> RolePrompts:
+        key = (role_config["name"], role_config.get("description"), role_config.get("system_prompt"))
+        prompts = self._roles.get(key)
+        if prompts is None:
+            prompts = self._roles[key] = RolePrompts(role_config)
+            while len(self._roles) > self.max_roles:
+                self._roles.popitem(last=False)
+        else:
+            self._roles.move_to_end(key)
+        return prompts
@@ -0,0 +1,117 @@
+import asyncio
+import time
+from typing import Dict, Any, Optional
+
+class TokenBucket:
+    """Token bucket that refills continuously up to a fixed capacity."""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_second)
+            self.updated_at = now
+
+    def delay_for(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` tokens are available (0 if they are now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_per_second
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+    def available(self) -> float:
+        self._refill(time.monotonic())
+        return self.tokens
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute budget for a single model.
+
+    Callers are served in arrival order: the lock is held while waiting, so a
+    large request cannot be starved by a stream of small ones.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+        self._lock = asyncio.Lock()
+        self.total_requests = 0
+        self.total_tokens = 0
+        self.total_wait_seconds = 0.0
+        self.waiting = 0
+
+    async def acquire(self, tokens: int = 0) -> float:
+        """Wait until one request and ``tokens`` tokens fit the budget; return the wait time."""
+        self.waiting += 1
+        waited = 0.0
+        try:
+            async with self._lock:
+                while True:
+                    now = time.monotonic()
+                    delay = max(self.requests.delay_for(1, now), self.tokens.delay_for(tokens, now))
+                    if delay <= 0:
+                        break
+                    await asyncio.sleep(delay)
+                    waited += delay
+                self.requests.take(1)
+                self.tokens.take(tokens)
+        finally:
+            self.waiting -= 1
+        self.total_requests += 1
+        self.total_tokens += tokens
+        self.total_wait_seconds += waited
+        return waited
+
+    def state(self) -> Dict[str, Any]:
+        """Current budget and usage counters, for metrics."""
+        return {
+            "requests_per_minute": self.requests_per_minute,
+            "tokens_per_minute": self.tokens_per_minute,
+            "available_requests": self.requests.available(),
+            "available_tokens": self.tokens.available(),
+            "waiting": self.waiting,
+            "total_requests": self.total_requests,
+            "total_tokens": self.total_tokens,
+            "total_wait_seconds": self.total_wait_seconds,
+        }
+
+class ModelRateLimits:
+    """Lazily created rate limiters, one per model, sharing default budgets."""
+
+    def __init__(self,
+                 requests_per_minute: int,
+                 tokens_per_minute: int,
+                 overrides: Optional[Dict[str, Dict[str, int]]] = None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.overrides = overrides or {}
+        self.limiters: Dict[str, RateLimiter] = {}
+
+    def for_model(self, model: str) -> RateLimiter:
+        """Return the limiter for a model, creating it on first use."""
+        limiter = self.limiters.get(model)
+        if limiter is None:
+            override = self.overrides.get(model, {})
+            limiter = RateLimiter(
+                override.get("requests_per_minute", self.requests_per_minute),
+                override.get("tokens_per_minute", self.tokens_per_minute),
+            )
+            self.limiters[model] = limiter
+        return limiter
+
+    def state(self) -> Dict[str, Dict[str, Any]]:
+        return {model: limiter.state() for model, limiter in self.limiters.items()}
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) used for budgeting."""
+    return len(text) // 4 + 1
@@ -0,0 +1,71 @@
+import asyncio
+import random
+from typing import Optional
+from google.api_core import exceptions as api_exceptions
+
+# Upstream errors that mean "slow down": quota or rate limit exhausted
+QUOTA_ERRORS = (
+    api_exceptions.ResourceExhausted,
+    api_exceptions.TooManyRequests,
+)
+
+# Transient upstream errors that are safe to retry
+TRANSIENT_ERRORS = (
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.InternalServerError,
+    api_exceptions.BadGateway,
+    api_exceptions.GatewayTimeout,
+    api_exceptions.DeadlineExceeded,
+    asyncio.TimeoutError,
+    ConnectionError,
+)
+
+class DeadlineExceededError(Exception):
+    """Raised when a request runs out of its overall time budget."""
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, honoring server-provided retry delays."""
+
+    def __init__(self,
+                 max_attempts: int = 3,
+                 base_delay: float = 1.0,
+                 max_delay: float = 60.0,
+                 deadline: Optional[float] = None):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    @staticmethod
+    def is_quota_error(error: BaseException) -> bool:
+        return isinstance(error, QUOTA_ERRORS)
+
+    def is_retryable(self, error: BaseException) -> bool:
+        return isinstance(error, QUOTA_ERRORS + TRANSIENT_ERRORS)
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter delay for the given zero-based attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def delay_for(self, error: BaseException, attempt: int) -> float:
+        """Delay before the next attempt, preferring the server's retry hint."""
+        server_delay = retry_after(error)
+        if server_delay is not None:
+            return min(self.max_delay, server_delay)
+        return self.backoff(attempt)
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Extract a server-provided retry delay (RetryInfo detail or Retry-After header)."""
+    for detail in getattr(error, "details", None) or ():
+        delay = getattr(detail, "retry_delay", None)
+        if delay is not None and hasattr(delay, "seconds"):
+            return delay.seconds + getattr(delay, "nanos", 0) / 1e9
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        value = headers.get("Retry-After") or headers.get("retry-after")
+        try:
+            return float(value) if value is not None else None
+        except (TypeError, ValueError):
+            return None
+    return None
@@ -0,0 +1,293 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from .config import AIServiceConfig
+from .conversation_service import ConversationService, Generation
+from .gemini_service import GeminiService
+from .retry import RetryPolicy, retry_after
+from ..metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger('RoutingService')
+
+class Route(NamedTuple):
+    """One way to serve a call: a backend service, optionally forced to a specific model."""
+    name: str
+    service: GeminiService
+    # None keeps the model requested by the caller (e.g. the role's own)
+    model: Optional[str] = None
+
+class LatencyWindow:
+    """Latencies of a route's most recent successful calls, for quantile estimates."""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def quantile(self, q: float) -> float:
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def _cause(error: BaseException) -> BaseException:
+    """The upstream error behind a service's wrapped "Error generating response" exception."""
+    while error.__cause__ is not None:
+        error = error.__cause__
+    return error
+
+class RoutingService(ConversationService):
+    """Conversation service that sends every model call through an ordered list of routes.
+
+    A call goes to the first healthy route. If it fails (including quota
+    exhaustion, which also benches the route for its retry delay) the next
+    route is tried at once. If it is still running after the route's observed
+    ``hedge_quantile`` latency, the call is also sent to the next route and
+    whichever answers first wins; the other call is cancelled. When every
+    route has failed, the whole sequence is retried per the retry policy, so
+    backends should be created without retries of their own.
+
+    The router only runs the conversations; rate limiting, caching and the
+    model clients belong to the backends. Routing decisions are exported as
+    metrics.
+    """
+
+    def __init__(self,
+                 config: Any,
+                 routes: List[Route],
+                 registry: Optional[MetricsRegistry] = None):
+        if len(routes) < 1:
+            raise ValueError("RoutingService needs at least one route")
+        super().__init__(config, routes[0].service.role_registry, registry)
+        self.routes = routes
+        self.retry_policy = RetryPolicy(
+            max_attempts=getattr(config, "retry_max_attempts", 3),
+            base_delay=getattr(config, "retry_base_delay", 1.0),
+            max_delay=getattr(config, "retry_max_delay", 60.0),
+            deadline=getattr(config, "request_deadline", 120.0),
+        )
+        self.hedge_requests = getattr(config, "hedge_requests", True)
+        self.hedge_quantile = getattr(config, "hedge_quantile", 0.95)
+        self.hedge_min_samples = getattr(config, "hedge_min_samples", 20)
+        self.latencies = {route.name: LatencyWindow() for route in routes}
+        # Route name -> time.monotonic() until which it is only used as a last resort
+        self._benched_until: Dict[str, float] = {}
+        self._register_routing_metrics(registry or metrics)
+
+    def _register_routing_metrics(self, registry: MetricsRegistry) -> None:
+        # Shared with the backends, which do not retry when routed
+        self.retries = registry.counter("gemini_retries_total", "Retried model calls by reason", ["model", "reason"])
+        self.route_calls = registry.counter(
+            "routing_calls_total", "Routed model calls by route and outcome (won, failed, cancelled)", ["route", "outcome"]
+        )
+        self.route_failovers = registry.counter(
+            "routing_failovers_total", "Calls moved to the next route after a failure", ["route", "reason"]
+        )
+        self.route_hedges = registry.counter(
+            "routing_hedges_total", "Duplicate calls sent because a route was slower than its latency quantile", ["route"]
+        )
+        self.route_latency = registry.histogram(
+            "routing_call_duration_seconds", "Latency of successful routed calls", ["route"]
+        )
+
+    def _ordered_routes(self) -> List[Route]:
+        """Routes in preference order, benched ones (recent quota errors) last."""
+        now = time.monotonic()
+        healthy = [route for route in self.routes if self._benched_until.get(route.name, 0) <= now]
+        return healthy + [route for route in self.routes if route not in healthy]
+
+    def _hedge_delay(self, route: Route) -> Optional[float]:
+        if not self.hedge_requests:
+            return None
+        window = self.latencies[route.name]
+        if len(window) < self.hedge_min_samples:
+            return None
+        return window.quantile(self.hedge_quantile)
+
+    def _record_failure(self, route: Route, error: BaseException) -> None:
+        cause = _cause(error)
+        quota = RetryPolicy.is_quota_error(cause)
+        if quota:
+            # Quotas are per minute unless the server says when to come back
+            bench = min(self.retry_policy.max_delay, retry_after(cause) or 60.0)
+            self._benched_until[route.name] = time.monotonic() + bench
+        self.route_calls.inc(route=route.name, outcome="failed")
+        self.route_failovers.inc(route=route.name, reason="quota" if quota else "error")
+        logger.warning("Route %s failed, failing over: %s", route.name, error)
+
+    async def _race(self, call: Callable[[Route], Awaitable[Any]]) -> Any:
+        """Run ``call`` on the routes with failover and hedging; return the first successful result."""
+        routes = self._ordered_routes()
+        pending: Dict[asyncio.Task, Tuple[Route, float]] = {}
+        errors: List[BaseException] = []
+        loop = asyncio.get_running_loop()
+        next_route = 0
+        hedged = False
+
+        def launch() -> None:
+            nonlocal next_route
+            route = routes[next_route]
+            next_route += 1
+            pending[asyncio.ensure_future(call(route))] = (route, loop.time())
+
+        launch()
+        try:
+            while pending:
+                timeout = None
+                if not hedged and next_route < len(routes) and len(pending) == 1:
+                    route, started = next(iter(pending.values()))
+                    delay = self._hedge_delay(route)
+                    if delay is not None:
+                        timeout = max(0.0, started + delay - loop.time())
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    self.route_hedges.inc(route=routes[next_route - 1].name)
+                    logger.info("Route %s is slow, hedging on %s", routes[next_route - 1].name, routes[next_route].name)
+                    launch()
+                    continue
+                for task in done:
+                    route, started = pending.pop(task)
+                    if task.exception() is None:
+                        elapsed = loop.time() - started
+                        self.latencies[route.name].observe(elapsed)
+                        self.route_latency.observe(elapsed, route=route.name)
+                        self.route_calls.inc(route=route.name, outcome="won")
+                        return task.result()
+                    errors.append(task.exception())
+                    self._record_failure(route, task.exception())
+                if not pending and next_route < len(routes):
+                    launch()
+            raise errors[-1]
+        finally:
+            # Losers: calls still running, or finished in the same instant as the winner
+            for task, (route, _) in pending.items():
+                task.cancel()
+                if task.done() and not task.cancelled():
+                    task.exception()
+                self.route_calls.inc(route=route.name, outcome="cancelled")
+
+    async def _route(self, call: Callable[[Route], Awaitable[Any]], model: Optional[str] = None) -> Any:
+        """``_race`` over all routes, retried per the retry policy (within its deadline) when every route fails."""
+        policy = self.retry_policy
+        model = self.routes[0].service._resolve_model(model)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + policy.deadline if policy.deadline else None
+        for attempt in range(policy.max_attempts):
+            try:
+                # Retries are only made while the deadline is ahead, so this is positive
+                remaining = None if deadline is None else deadline - loop.time()
+                return await asyncio.wait_for(self._race(call), remaining)
+            except asyncio.TimeoutError as e:
+                error = f"Request deadline of {policy.deadline}s exceeded"
+                logger.error("%s", error)
+                raise Exception(f"Error generating response: {error}") from e
+            except Exception as e:
+                cause = _cause(e)
+                if not policy.is_retryable(cause) or attempt == policy.max_attempts - 1:
+                    raise
+                delay = policy.delay_for(cause, attempt)
+                if deadline is not None and loop.time() + delay >= deadline:
+                    logger.warning("Retry would exceed the request deadline, giving up")
+                    raise
+                logger.warning("All routes failed, waiting %.2f seconds before retry...", delay)
+                self.retries.inc(model=model, reason="quota" if policy.is_quota_error(cause) else "transient")
+                await asyncio.sleep(delay)
+
+    async def generate(self,
+                       prompt: str,
+                       context: Optional[Iterable[Dict[str, str]]] = None,
+                       max_tokens: Optional[int] = None,
+                       use_cache: bool = False,
+                       model: Optional[str] = None,
+                       temperature: Optional[float] = None,
+                       role: Optional[str] = None,
+                       system_instruction: Optional[str] = None) -> Generation:
+        # Applied once here, so hedged and failed-over calls share one (possibly summarized) context
+        context = await self._build_context(context)
+        return await self._route(lambda route: route.service.generate(
+            prompt, context, max_tokens, use_cache, route.model or model, temperature, role, system_instruction,
+            build_context=False,
+        ), model)
+
+    async def stream_response(self,
+                              prompt: str,
+                              context: Optional[Iterable[Dict[str, str]]] = None,
+                              max_tokens: Optional[int] = None,
+                              use_cache: bool = False,
+                              model: Optional[str] = None,
+                              temperature: Optional[float] = None,
+                              role: Optional[str] = None,
+                              system_instruction: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream from the route that delivers the first chunk; later errors are not failed over."""
+        context = await self._build_context(context)
+
+        async def first_chunk(route: Route) -> Tuple[AsyncIterator[str], Optional[str]]:
+            stream = route.service.stream_response(
+                prompt, context, max_tokens, use_cache, route.model or model, temperature, role, system_instruction,
+                build_context=False,
+            )
+            try:
+                return stream, await stream.__anext__()
+            except StopAsyncIteration:
+                return stream, None
+
+        stream, chunk = await self._route(first_chunk, model)
+        if chunk is None:
+            return
+        yield chunk
+        async for chunk in stream:
+            yield chunk
+
+    def _services(self) -> List[GeminiService]:
+        services = []
+        for route in self.routes:
+            if all(service is not route.service for service in services):
+                services.append(route.service)
+        return services
+
+    async def validate_model(self) -> Optional[bool]:
+        results = await asyncio.gather(*(service.validate_model() for service in self._services()))
+        return results[0]
+
+    def _has_spare_quota(self, role_config: Dict[str, Any]) -> bool:
+        return self.routes[0].service._has_spare_quota(role_config)
+
+    def clear_response_cache(self) -> None:
+        for service in {id(route.service): route.service for route in self.routes}.values():
+            service.clear_response_cache()
+
+    def stats(self) -> Dict[str, Any]:
+        """The primary backend's statistics plus speculation and each route's latency samples, hedge delay and bench time."""
+        now = time.monotonic()
+        routes = {
+            route.name: {
+                "model": route.model,
+                "samples": len(self.latencies[route.name]),
+                "hedge_after": self._hedge_delay(route),
+                "benched_for": max(0.0, self._benched_until.get(route.name, 0) - now),
+            }
+            for route in self.routes
+        }
+        return {
+            **self.routes[0].service.stats(),
+            "speculation": self.prefetcher.stats() if self.prefetcher else None,
+            "routes": routes,
+        }
+
+def create_ai_service(config: AIServiceConfig) -> ConversationService:
+    """The configured AI service: a GeminiService, routed over fallback_models when any are set."""
+    fallback_models = getattr(config, "fallback_models", [])
+    if not fallback_models:
+        return GeminiService(config)
+    # The router retries across routes, so the backend fails fast instead of retrying
+    # one model, and speculates itself so that speculative turns are routed too
+    backend = GeminiService(config.model_copy(update={"retry_max_attempts": 1, "speculative_turns": 0}))
+    routes = [Route("primary", backend)] + [
+        Route(GeminiService.normalize_model(model), backend, model) for model in fallback_models
+    ]
+    return RoutingService(config, routes)
@@ -0,0 +1,58 @@
+import asyncio
+from typing import Dict, Any, Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into a single call.
+
+    The first caller for a key starts the call in its own task; callers
+    arriving while it is in flight await the same result (or exception).
+    A caller that is cancelled only stops waiting; the shared call is
+    cancelled once no caller is waiting for it any more.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.calls = 0
+        self.deduplicated = 0
+        self.abandoned = 0
+
+    def _forget(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    async def run(self, key: str, call: Callable[[], Awaitable[T]]) -> T:
+        """Return the result of ``call()``, sharing it with concurrent callers of the same key."""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(call()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.calls += 1
+        else:
+            self.deduplicated += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody is waiting any more; later callers must start a fresh call
+                self._forget(key, flight)
+                flight.task.cancel()
+                self.abandoned += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._flights),
+            "calls": self.calls,
+            "deduplicated": self.deduplicated,
+            "abandoned": self.abandoned,
+        }
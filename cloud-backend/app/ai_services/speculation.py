@@ -0,0 +1,122 @@
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from .conversation import Conversation
+from ..metrics import MetricsRegistry, metrics
+
+# Generates a role's turn: (role_config, prompt, context, max_tokens) -> text
+TurnGenerator = Callable[[Dict[str, Any], str, Conversation, Optional[int]], Awaitable[str]]
+
+def speaker_name(message: Dict[str, str]) -> Optional[str]:
+    """Name of the role that wrote a message ("[Name] ..."), or None for other messages."""
+    content = message["content"]
+    if message["role"] != "model" or not content.startswith("[") or "]" not in content:
+        return None
+    return content[1:content.index("]")]
+
+def rank_next_speakers(messages: List[Dict[str, str]], roles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Roles ordered by how likely they are to speak next in a turn-based conversation.
+
+    Speakers take turns, so the role that spoke last is least likely and the
+    ones that have waited longest (or not spoken yet) are most likely.
+    """
+    last_spoke: Dict[str, int] = {}
+    for index, message in enumerate(messages):
+        name = speaker_name(message)
+        if name is not None:
+            last_spoke[name] = index
+    just_spoke = [name for name, index in last_spoke.items() if index == len(messages) - 1]
+    ranked = sorted(roles, key=lambda role: last_spoke.get(role["name"], -1))
+    return [role for role in ranked if role["name"] not in just_spoke]
+
+class TurnPrefetcher:
+    """Speculatively generated next turns, keyed on the history hash.
+
+    After a turn completes, candidate turns for the ``turns`` most likely next
+    speakers are generated in the background, but only while ``has_spare``
+    says their model's quota has room and at most ``max_in_flight`` are
+    running. A candidate is served when its speaker is chosen for exactly the
+    same history, prompt and length. Speculating for a longer history cancels
+    and drops the candidates of every earlier state of it.
+    """
+
+    def __init__(self,
+                 generate: TurnGenerator,
+                 has_spare: Callable[[Dict[str, Any]], bool],
+                 turns: int = 2,
+                 max_in_flight: int = 4,
+                 max_histories: int = 64,
+                 registry: Optional[MetricsRegistry] = None):
+        self.generate = generate
+        self.has_spare = has_spare
+        self.turns = turns
+        self.max_in_flight = max_in_flight
+        self.max_histories = max_histories
+        # History digest -> {(role name, prompt, max_tokens): task}
+        self._candidates: "OrderedDict[str, Dict[Tuple[str, str, Optional[int]], asyncio.Task]]" = OrderedDict()
+        self.outcomes = (registry or metrics).counter(
+            "speculative_turns_total", "Speculatively generated turns by outcome", ["outcome"]
+        )
+
+    def in_flight(self) -> int:
+        return sum(not task.done() for turns in self._candidates.values() for task in turns.values())
+
+    def speculate(self,
+                  conversation: Conversation,
+                  roles: List[Dict[str, Any]],
+                  prompt: Callable[[Dict[str, Any]], str],
+                  max_tokens: Optional[int] = None) -> int:
+        """Start generating the likely next turns after ``conversation``; return how many were started."""
+        digest = conversation.digest
+        # The history has moved on from any earlier state we speculated for
+        for length in range(len(conversation)):
+            self._drop(conversation.prefix_digest(length))
+        # The candidates must see the history as it is now, not as it grows
+        context = conversation.prefix(len(conversation))
+        candidates = self._candidates.setdefault(digest, {})
+        self._candidates.move_to_end(digest)
+        started = 0
+        for role_config in rank_next_speakers(conversation.messages, roles)[:self.turns]:
+            tokens = max_tokens or role_config.get("max_tokens")
+            role_prompt = prompt(role_config)
+            key = (role_config["name"], role_prompt, tokens)
+            if key in candidates:
+                continue
+            if self.in_flight() >= self.max_in_flight or not self.has_spare(role_config):
+                self.outcomes.inc(outcome="skipped")
+                continue
+            task = asyncio.create_task(self.generate(role_config, role_prompt, context, tokens))
+            # Failures are only reported if the turn is actually requested
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            candidates[key] = task
+            started += 1
+            self.outcomes.inc(outcome="started")
+        if not candidates:
+            del self._candidates[digest]
+        while len(self._candidates) > self.max_histories:
+            self._drop(next(iter(self._candidates)))
+        return started
+
+    def take(self, conversation: Conversation, role_name: str, prompt: str, max_tokens: Optional[int]) -> Optional[asyncio.Task]:
+        """Remove and return the candidate turn for this exact request, if one was speculated."""
+        candidates = self._candidates.get(conversation.digest)
+        task = candidates.pop((role_name, prompt, max_tokens), None) if candidates else None
+        if task is None:
+            return None
+        if task.done() and (task.cancelled() or task.exception() is not None):
+            self.outcomes.inc(outcome="failed")
+            return None
+        self.outcomes.inc(outcome="served")
+        return task
+
+    def _drop(self, digest: str) -> None:
+        for task in self._candidates.pop(digest, {}).values():
+            task.cancel()
+            self.outcomes.inc(outcome="discarded")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "histories": len(self._candidates),
+            "candidates": sum(len(turns) for turns in self._candidates.values()),
+            "in_flight": self.in_flight(),
+        }
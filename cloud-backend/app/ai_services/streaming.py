@@ -0,0 +1,25 @@
+import asyncio
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable
+
+# Receives streaming events: {"type": "delta", ...} and {"type": "message", ...}
+EventCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+async def stream_events(produce: Callable[[EventCallback], Awaitable[Any]]) -> AsyncIterator[Dict[str, Any]]:
+    """Run ``produce(on_event)`` in a task and yield the events it emits as they happen.
+
+    Exceptions raised by the producer are re-raised after the last event.
+    Closing the iterator early (e.g. when the client disconnects) cancels the
+    producer and with it any in-flight model calls.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(produce(queue.put))
+    task.add_done_callback(lambda _: queue.put_nowait(None))
+    try:
+        while True:
+            event = await queue.get()
+            if event is None:
+                break
+            yield event
+        await task
+    finally:
+        task.cancel()
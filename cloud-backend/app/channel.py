@@ -0,0 +1,115 @@
+import json
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+from fastapi import WebSocket, WebSocketDisconnect
+from .ai_services.streaming import EventCallback
+
+logger = logging.getLogger('SocketChannel')
+
+class SocketChannel:
+    """Several concurrent event streams multiplexed over one WebSocket.
+
+    Every event sent carries the ``id`` of the stream it belongs to. Events
+    go through a bounded queue drained by a single sender, so when the client
+    reads slowly the queue fills up and the streams producing events wait
+    (and with them the model calls feeding them) instead of buffering without
+    limit. Each stream runs in its own task and can be cancelled on its own;
+    closing the socket cancels them all.
+
+    Client messages are handled without ever waiting on that queue: replies
+    to them go through ``reply``, which never blocks, so a cancel is acted on
+    even while the streams are stalled on a slow client.
+    """
+
+    def __init__(self, websocket: WebSocket, max_queued: int = 256, max_replies: int = 64):
+        self.websocket = websocket
+        self._queue: asyncio.Queue = asyncio.Queue(max_queued)
+        # Replies to client messages, sent ahead of queued stream events; the oldest are dropped on overflow
+        self._replies: deque = deque(maxlen=max_replies)
+        self._streams: Dict[str, asyncio.Task] = {}
+        self.closed = False
+
+    async def send(self, stream_id: Optional[str], event: Dict[str, Any]) -> None:
+        """Queue an event for the client, waiting while the queue is full."""
+        if not self.closed:
+            await self._queue.put({"id": stream_id, **event})
+
+    def reply(self, stream_id: Optional[str], event: Dict[str, Any]) -> None:
+        """Send an event in answer to a client message without waiting for the queue."""
+        if self.closed:
+            return
+        if len(self._replies) == self._replies.maxlen:
+            logger.warning("Dropping reply to a client that is not reading")
+        self._replies.append({"id": stream_id, **event})
+        try:
+            # Wakes the sender if it is waiting for stream events
+            self._queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+    def busy(self, stream_id: str) -> bool:
+        return stream_id in self._streams
+
+    def start(self, stream_id: str, produce: Callable[[EventCallback], Awaitable[Any]]) -> None:
+        """Run ``produce(on_event)`` as stream ``stream_id``, ending it with a done, error or cancelled event."""
+        async def run():
+            try:
+                await produce(lambda event: self.send(stream_id, event))
+            except asyncio.CancelledError:
+                await self.send(stream_id, {"type": "cancelled"})
+            except Exception as e:
+                detail = getattr(e, "detail", None) or str(e)
+                logger.error("Stream %s failed: %s", stream_id, detail)
+                await self.send(stream_id, {"type": "error", "detail": detail})
+            else:
+                await self.send(stream_id, {"type": "done"})
+            finally:
+                self._streams.pop(stream_id, None)
+
+        self._streams[stream_id] = asyncio.create_task(run())
+
+    def cancel(self, stream_id: str) -> bool:
+        task = self._streams.get(stream_id)
+        if task is None:
+            return False
+        task.cancel()
+        return True
+
+    async def _send_forever(self) -> None:
+        while True:
+            while self._replies:
+                await self.websocket.send_text(json.dumps(self._replies.popleft()))
+            event = await self._queue.get()
+            if event is not None:
+                await self.websocket.send_text(json.dumps(event))
+
+    async def serve(self, handle: Callable[[Dict[str, Any]], None]) -> None:
+        """Pass every client message to ``handle`` until the client disconnects, then clean up.
+
+        ``handle`` runs on the reader, so it must not block: it answers with
+        ``reply`` and starts streams with ``start``.
+        """
+        await self.websocket.accept()
+        sender = asyncio.create_task(self._send_forever())
+        try:
+            while not sender.done():
+                try:
+                    message = json.loads(await self.websocket.receive_text())
+                    if not isinstance(message, dict):
+                        raise ValueError("Messages must be JSON objects")
+                except (ValueError, TypeError) as e:
+                    self.reply(None, {"type": "error", "detail": f"Invalid message: {e}"})
+                    continue
+                handle(message)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            self.closed = True
+            streams = list(self._streams.values())
+            for task in streams:
+                task.cancel()
+            await asyncio.gather(*streams, return_exceptions=True)
+            sender.cancel()
+            await asyncio.gather(sender, return_exceptions=True)
@@ -0,0 +1,241 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from .ai_services.streaming import EventCallback
+from .metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger('Jobs')
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TIMED_OUT = "timed_out"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED, TIMED_OUT)
+
+class JobQueueFullError(Exception):
+    """Raised when a job is submitted while the queue is full."""
+
+class Job:
+    """A background conversation: its state, the messages produced so far and text still being generated."""
+
+    def __init__(self, job_id: str, run: Callable[[EventCallback], Awaitable[Any]],
+                 deadline: Optional[float] = None, session_id: Optional[str] = None):
+        self.id = job_id
+        self.run = run
+        self.session_id = session_id
+        self.status = QUEUED
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # Absolute time (time.time()) after which the job is stopped, queueing included
+        self.deadline = self.created_at + deadline if deadline else None
+        self.last_polled = self.created_at
+        self.messages: List[Dict[str, str]] = []
+        # Text generated so far for replies that are not complete yet, by role
+        self.partial: Dict[str, str] = {}
+        self.task: Optional[asyncio.Task] = None
+        self._cancel_reason: Optional[str] = None
+
+    async def on_event(self, event: Dict[str, Any]) -> None:
+        if event["type"] == "delta":
+            self.partial[event["role"]] = self.partial.get(event["role"], "") + event["content"]
+        elif event["type"] == "message":
+            self.messages.append(event["message"])
+            self.partial.clear()
+
+    def to_dict(self, since: int = 0) -> Dict[str, Any]:
+        """Job state with the messages after the first ``since`` (for incremental polling)."""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "session_id": self.session_id,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "messages": self.messages[since:],
+            "next": len(self.messages),
+            "partial": dict(self.partial),
+        }
+
+class JobManager:
+    """Runs conversation jobs on a bounded pool of asyncio workers.
+
+    At most ``workers`` jobs run at once; up to ``max_queued`` more wait in
+    the queue. A job is stopped, cancelling its in-flight model calls, when
+    it is cancelled, when its deadline passes, or when nobody has polled it
+    for ``idle_timeout`` seconds (the client went away). Finished jobs are
+    kept for ``ttl`` seconds, and at most ``max_jobs`` jobs are retained.
+    """
+
+    def __init__(self,
+                 workers: int = 4,
+                 max_queued: int = 100,
+                 deadline: Optional[float] = 600.0,
+                 idle_timeout: Optional[float] = 120.0,
+                 ttl: float = 3600.0,
+                 max_jobs: int = 1000,
+                 registry: Optional[MetricsRegistry] = None):
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.deadline = deadline
+        self.idle_timeout = idle_timeout
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self.finished = (registry or metrics).counter(
+            "conversation_jobs_total", "Finished background conversation jobs by status", ["status"]
+        )
+        self.duration = (registry or metrics).histogram(
+            "conversation_job_duration_seconds", "Time from submitting a job to its completion", ["status"]
+        )
+
+    def start(self) -> None:
+        """Start the workers and the reaper (idempotent; needs a running event loop)."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(self.max_queued)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._reap_forever()))
+
+    async def stop(self) -> None:
+        """Cancel every unfinished job, wait for the running ones to unwind and stop the workers."""
+        unfinished = [job for job in self._jobs.values() if job.status not in FINISHED]
+        for job in unfinished:
+            self._cancel(job, CANCELLED, "Server shutting down")
+        await asyncio.gather(*(job.task for job in unfinished if job.task is not None), return_exceptions=True)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Jobs whose worker was stopped before it could record the outcome
+        for job in unfinished:
+            if job.status not in FINISHED:
+                self._finish(job, CANCELLED, "Server shutting down")
+
+    def submit(self, run: Callable[[EventCallback], Awaitable[Any]],
+               deadline: Optional[float] = None, session_id: Optional[str] = None) -> Job:
+        """Queue ``run(on_event)`` as a job and return it without waiting."""
+        self.start()
+        job = Job(uuid.uuid4().hex, run, deadline or self.deadline, session_id)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFullError(f"Too many queued jobs (limit {self.max_queued})")
+        self._jobs[job.id] = job
+        self._prune()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return the job and note that a client is still interested in it."""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            job.last_polled = time.time()
+        return job
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is not None and job.status not in FINISHED:
+            self._cancel(job, CANCELLED, "Cancelled by client")
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"workers": self.workers, "queued": self._queue.qsize() if self._queue else 0, "jobs": counts}
+
+    def _cancel(self, job: Job, status: str, reason: str) -> None:
+        if job.task is not None:
+            # The worker records the outcome once the task has unwound
+            job._cancel_reason = job._cancel_reason or f"{status}:{reason}"
+            job.task.cancel()
+        else:
+            self._finish(job, status, reason)
+
+    def _finish(self, job: Job, status: str, error: Optional[str] = None) -> None:
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        job.partial.clear()
+        self.finished.inc(status=status)
+        self.duration.observe(job.finished_at - job.created_at, status=status)
+        logger.info("Job %s %s", job.id, status)
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.status == QUEUED:
+                    await self._run(job)
+            except Exception:
+                logger.exception("Job worker failed on job %s", job.id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job) -> None:
+        if job.deadline is not None and time.time() >= job.deadline:
+            self._finish(job, TIMED_OUT, "Deadline exceeded while queued")
+            return
+        job.status = RUNNING
+        job.started_at = time.time()
+        job.task = asyncio.create_task(job.run(job.on_event))
+        timeout = None if job.deadline is None else job.deadline - time.time()
+        done, _ = await asyncio.wait({job.task}, timeout=timeout)
+        if not done:
+            job._cancel_reason = job._cancel_reason or f"{TIMED_OUT}:Deadline exceeded"
+            job.task.cancel()
+            await asyncio.wait({job.task})
+        task, job.task = job.task, None
+        if task.cancelled():
+            status, _, reason = (job._cancel_reason or f"{CANCELLED}:Cancelled").partition(":")
+            self._finish(job, status, reason)
+        elif task.exception() is not None:
+            self._finish(job, FAILED, str(task.exception()))
+        else:
+            self._finish(job, SUCCEEDED)
+
+    def _reap(self) -> None:
+        """Cancel jobs nobody polls any more and forget expired finished jobs."""
+        now = time.time()
+        for job in list(self._jobs.values()):
+            if job.status in FINISHED:
+                if now - job.finished_at > self.ttl:
+                    del self._jobs[job.id]
+            elif self.idle_timeout and now - job.last_polled > self.idle_timeout:
+                self._cancel(job, CANCELLED, f"Abandoned: not polled for {self.idle_timeout:.0f}s")
+
+    async def _reap_forever(self, interval: float = 1.0) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            self._reap()
+
+    def _prune(self) -> None:
+        """Drop the oldest finished jobs beyond ``max_jobs``."""
+        excess = len(self._jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        for job_id in [job.id for job in self._jobs.values() if job.status in FINISHED][:excess]:
+            del self._jobs[job_id]
+
+def _optional_seconds(name: str, default: str) -> Optional[float]:
+    value = float(os.getenv(name, default))
+    return value if value > 0 else None
+
+def create_job_manager() -> JobManager:
+    """Job manager configured by JOB_WORKERS, JOB_QUEUE_SIZE, JOB_DEADLINE and JOB_IDLE_TIMEOUT (0 disables the last two)."""
+    return JobManager(
+        workers=int(os.getenv("JOB_WORKERS", "4")),
+        max_queued=int(os.getenv("JOB_QUEUE_SIZE", "100")),
+        deadline=_optional_seconds("JOB_DEADLINE", "600"),
+        idle_timeout=_optional_seconds("JOB_IDLE_TIMEOUT", "120"),
+    )
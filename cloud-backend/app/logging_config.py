@@ -0,0 +1,78 @@
+import os
+import sys
+import json
+import atexit
+import queue
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, plus any ``extra`` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        return json.dumps(entry, default=str)
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """Parse per-logger levels, e.g. "GeminiService=DEBUG,httpx=WARNING"."""
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+def setup_logging(level: Optional[str] = None,
+                  log_format: Optional[str] = None,
+                  log_file: Optional[str] = None,
+                  levels: Optional[Dict[str, str]] = None) -> logging.handlers.QueueListener:
+    """Route all logging through a queue so the event loop never blocks on log I/O.
+
+    Loggers only enqueue records; a listener thread formats them and writes
+    them to stderr (and ``log_file`` if given). Defaults come from LOG_LEVEL
+    (INFO), LOG_FORMAT ("json" or "text"), LOG_FILE and LOG_LEVELS
+    (per-logger overrides). Returns the started listener, which is stopped
+    at exit so pending records are flushed.
+    """
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    log_format = log_format or os.getenv("LOG_FORMAT", "json")
+    log_file = log_file or os.getenv("LOG_FILE")
+    if levels is None:
+        levels = parse_levels(os.getenv("LOG_LEVELS", ""))
+
+    if log_format == "json":
+        formatter = JSONFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handlers = [logging.StreamHandler(sys.stderr)]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+    for name, logger_level in levels.items():
+        logging.getLogger(name).setLevel(logger_level)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
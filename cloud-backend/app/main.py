@@ -1,13 +1,46 @@
-import os
 import json
-from typing import Dict, List, Optional
-from fastapi import FastAPI, HTTPException
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional
+from fastapi import FastAPI, HTTPException, Header, Query, Request, Response, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from .ai_services.gemini_service import GeminiService
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from .logging_config import setup_logging
+from .metrics import RequestMetricsMiddleware, metrics
+from .ai_services.routing import create_ai_service
 from .ai_services.config import AIServiceConfig
+from .ai_services.conversation import Conversation
+from .ai_services.speculation import speaker_name
+from .ai_services.streaming import EventCallback, stream_events
+from .role_registry import role_registry
+from .role_listing import RoleListCache, InvalidCursorError
+from .sessions import Session, create_session_store
+from .jobs import JobQueueFullError, create_job_manager
+from .channel import SocketChannel
 
-app = FastAPI()
+# Non-blocking logging, configured before anything logs (LOG_LEVEL, LOG_FORMAT, LOG_FILE, LOG_LEVELS)
+setup_logging()
+
+# Initialize Gemini service with default config (no network calls until first use);
+# with FALLBACK_MODELS set, calls are routed with failover and hedging
+config = AIServiceConfig()
+gemini_service = create_ai_service(config)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Validate the model in the background so startup never waits on the API; flush roles on shutdown."""
+    validation = asyncio.create_task(gemini_service.validate_model())
+    job_manager.start()
+    yield
+    validation.cancel()
+    # Stop background conversations and their in-flight model calls
+    await job_manager.stop()
+    # Write out role changes still waiting to be coalesced
+    await role_registry.flush()
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -17,31 +50,35 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Per-route request latency, exposed at /metrics
+app.add_middleware(RequestMetricsMiddleware)
 
-# Initialize Gemini service with default config
-config = AIServiceConfig()
-gemini_service = GeminiService(config)
+# Server-side conversation sessions (in memory, or SQLite with SESSION_STORE=sqlite)
+session_store = create_session_store()
+# Background conversation jobs (JOB_WORKERS, JOB_QUEUE_SIZE, JOB_DEADLINE, JOB_IDLE_TIMEOUT)
+job_manager = create_job_manager()
 
-# Configuration file path
-CONFIG_FILE = os.path.join(os.path.dirname(__file__), "config", "roles.json")
+# Serialized role list responses, reused until the roles change
+role_list_cache = RoleListCache(role_registry)
 
-def load_roles() -> Dict:
-    """Load roles from configuration file."""
-    try:
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE, 'r') as f:
-                return json.load(f)
-        return {"roles": {}}
-    except Exception as e:
-        print(f"Error loading roles: {e}")
-        return {"roles": {}}
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches the current ETag (weak comparison)."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+async def save_roles(change: Callable[[Dict], Any]) -> Any:
+    """Apply a change to the roles; the configuration file is rewritten atomically in the background.
 
-def save_roles(roles: Dict) -> None:
-    """Save roles to configuration file."""
+    Cached responses are dropped, so an edited role's replies do not outlive the edit.
+    """
     try:
-        os.makedirs(os.path.dirname(CONFIG_FILE), exist_ok=True)
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(roles, f, indent=2)
+        result = await role_registry.mutate(change)
+        gemini_service.clear_response_cache()
+        return result
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error saving roles: {e}")
         raise HTTPException(status_code=500, detail="Failed to save roles")
@@ -53,6 +90,7 @@ class RoleConfig(BaseModel):
     temperature: float
     max_tokens: int
     system_prompt: Optional[str] = None
+    cache_responses: bool = False
     original_name: Optional[str] = None
 
 class ConversationRequest(BaseModel):
@@ -63,27 +101,61 @@ class ConversationRequest(BaseModel):
     conversation_history: Optional[List[Dict[str, str]]] = None
     next_speaker: Optional[str] = None
     user_input: Optional[str] = None
+    parallel: Optional[bool] = None
+    # Continue a server-side session instead of re-sending conversation_history
+    session_id: Optional[str] = None
+
+class JobRequest(ConversationRequest):
+    # Seconds before the job is stopped; defaults to JOB_DEADLINE
+    deadline: Optional[float] = None
 
 class TestRoleRequest(BaseModel):
     role_name: str
     question: str
     max_tokens: Optional[int] = None
 
+class BatchTestRequest(BaseModel):
+    role_names: List[str]
+    questions: List[str]
+    max_tokens: Optional[int] = None
+    # Items in flight at once; defaults to the service's max_concurrent_requests
+    concurrency: Optional[int] = None
+
+# Largest roles x questions matrix accepted by one batch request
+MAX_BATCH_ITEMS = 500
+
 # Step 2: Add NextTurnRequest model
 class NextTurnRequest(BaseModel):
-    conversation_history: List[Dict[str, str]]
+    conversation_history: Optional[List[Dict[str, str]]] = None
     next_speaker: str
     topic: str
     max_tokens: Optional[int] = None
+    session_id: Optional[str] = None
+    # Roles that may speak next, for speculative prefetch; defaults to those who have spoken
+    active_roles: Optional[List[str]] = None
 
 @app.get("/api/roles")
-async def get_roles():
-    """Get all available roles."""
+async def get_roles(if_none_match: Optional[str] = Header(None),
+                    fields: Optional[str] = None,
+                    cursor: Optional[str] = None,
+                    limit: Optional[int] = Query(None, ge=1, le=1000)):
+    """Get all available roles; answers 304 when the client's copy is current.
+
+    ``fields`` (comma-separated) limits the attributes returned per role;
+    ``limit`` pages the list, continuing from ``cursor`` (the previous
+    page's ``next_cursor``).
+    """
     try:
-        roles_data = load_roles()
-        # Convert the roles dictionary to a list of role objects
-        roles_list = list(roles_data["roles"].values())
-        return {"roles": roles_list}
+        version = role_registry.version
+        # no-cache: browsers revalidate every time, which is a cheap 304 while roles are unchanged
+        headers = {"ETag": f'"{version}"', "Cache-Control": "no-cache"}
+        if etag_matches(if_none_match, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        projection = tuple(field.strip() for field in fields.split(",") if field.strip()) if fields else None
+        body = role_list_cache.body(version, projection, cursor, limit)
+        return Response(content=body, media_type="application/json", headers=headers)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error getting roles: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get roles: {str(e)}")
@@ -91,48 +163,42 @@ async def get_roles():
 @app.post("/api/roles/add")
 async def add_role(role: RoleConfig):
     """Add a new role."""
-    roles_data = load_roles()
-    if role.name in roles_data["roles"]:
-        raise HTTPException(status_code=400, detail="Role already exists")
+    def add(roles: Dict) -> None:
+        if role_registry.resolve(role.name):
+            raise HTTPException(status_code=400, detail="Role already exists")
+        roles[role_registry.normalize(role.name)] = role.dict(exclude={'original_name'})
     
-    roles_data["roles"][role.name] = role.dict()
-    save_roles(roles_data)
+    await save_roles(add)
     return {"message": "Role added successfully"}
 
 @app.post("/api/roles/update")
 async def update_role(role: RoleConfig):
     """Update an existing role."""
-    try:
-        roles_data = load_roles()
+    def update(roles: Dict) -> None:
+        # Resolve the existing role by its original name (or its current name)
+        resolved = role_registry.resolve(role.original_name or role.name)
+        if not resolved:
+            raise HTTPException(status_code=404, detail=f"Role '{role.original_name or role.name}' not found")
+        original_key, _ = resolved
         
-        # If we have an original name, use it to find the role
-        if role.original_name:
-            # Convert display name to key format (e.g., "Customer Advocate" -> "customer_advocate")
-            original_key = role.original_name.lower().replace(" ", "_")
-            if original_key not in roles_data["roles"]:
-                raise HTTPException(status_code=404, detail=f"Role '{role.original_name}' not found")
-            
-            # If the name has changed, we need to delete the old entry
-            if role.original_name != role.name:
-                del roles_data["roles"][original_key]
-        else:
-            # Try to find the role by name
-            found = False
-            for key, existing_role in roles_data["roles"].items():
-                if existing_role["name"] == role.name:
-                    found = True
-                    break
-            
-            if not found:
-                raise HTTPException(status_code=404, detail=f"Role '{role.name}' not found")
+        # Renaming onto another existing role would silently overwrite it
+        clash = role_registry.resolve(role.name)
+        if clash and clash[0] != original_key:
+            raise HTTPException(status_code=400, detail=f"Role '{role.name}' already exists")
         
-        # Convert new name to key format
-        new_key = role.name.lower().replace(" ", "_")
+        # Convert new name to key format and drop the old entry if the key changed
+        new_key = role_registry.normalize(role.name)
+        if new_key != original_key:
+            del roles[original_key]
         
         # Add/update the role with the new key
-        roles_data["roles"][new_key] = role.dict(exclude={'original_name'})
-        save_roles(roles_data)
+        roles[new_key] = role.dict(exclude={'original_name'})
+    
+    try:
+        await save_roles(update)
         return {"message": "Role updated successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error updating role: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to update role: {str(e)}")
@@ -140,137 +206,422 @@ async def update_role(role: RoleConfig):
 @app.post("/api/roles/delete")
 async def delete_role(role_name: str):
     """Delete a role."""
-    roles_data = load_roles()
-    if role_name not in roles_data["roles"]:
-        raise HTTPException(status_code=404, detail="Role not found")
+    def delete(roles: Dict) -> None:
+        resolved = role_registry.resolve(role_name)
+        if not resolved:
+            raise HTTPException(status_code=404, detail="Role not found")
+        del roles[resolved[0]]
     
-    del roles_data["roles"][role_name]
-    save_roles(roles_data)
+    await save_roles(delete)
     return {"message": "Role deleted successfully"}
 
-@app.post("/api/ai/conversation")
-async def start_conversation(request: ConversationRequest):
-    """Start a new conversation with multiple AI roles."""
-    try:
-        roles_data = load_roles()
-        active_roles = {}
-        
-        for role_name in request.active_roles:
-            # Try to find the role by display name first
-            role_found = False
-            for key, role in roles_data["roles"].items():
-                if role["name"] == role_name:
-                    active_roles[key] = role
-                    role_found = True
-                    break
+def resolve_active_roles(request: ConversationRequest) -> Dict[str, Dict]:
+    """Resolve the requested active roles (and next speaker) to their configurations."""
+    active_roles = {}
+    
+    for role_name in request.active_roles:
+        resolved = role_registry.resolve(role_name)
+        if not resolved:
+            raise HTTPException(status_code=404, detail=f"Role {role_name} not found")
+        key, role = resolved
+        active_roles[key] = role
+    
+    if not active_roles:
+        raise HTTPException(status_code=400, detail="No active roles specified")
+    
+    if request.next_speaker:
+        # Find the role by name or key
+        resolved = role_registry.resolve(request.next_speaker)
+        if not resolved or resolved[0] not in active_roles:
+            raise HTTPException(status_code=404, detail=f"Next speaker {request.next_speaker} not found in active roles")
+    
+    return active_roles
+
+async def open_session(session_id: Optional[str],
+                       topic: str,
+                       history: Optional[List[Dict[str, str]]] = None) -> Session:
+    """Return the requested session, or start a new one seeded with ``history``."""
+    if session_id:
+        session = await session_store.get(session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+        return session
+    return await session_store.create(topic, history)
+
+async def run_conversation(request: ConversationRequest,
+                           active_roles: Dict[str, Dict],
+                           session: Session,
+                           on_event: Optional[EventCallback] = None) -> List[Dict[str, str]]:
+    """Generate the next turns of a session and return the messages they added.
+
+    Events are streamed to ``on_event``; the new messages are persisted to the
+    session even if generation fails part-way.
+    """
+    async with session.lock:
+        conversation = session.conversation
+        start = len(conversation)
+        try:
+            # If we have user input, update the topic
+            if request.user_input:
+                request.topic = request.user_input
             
-            # If not found by display name, try the underscore key
-            if not role_found:
-                role_key = role_name.lower().replace(" ", "_")
-                if role_key not in roles_data["roles"]:
-                    raise HTTPException(status_code=404, detail=f"Role {role_name} not found")
-                active_roles[role_key] = roles_data["roles"][role_key]
-        
-        if not active_roles:
-            raise HTTPException(status_code=400, detail="No active roles specified")
-        
-        # If we have user input, update the topic
-        if request.user_input:
-            request.topic = request.user_input
-        
-        # If we have a next speaker specified, only that role should respond
-        if request.next_speaker:
-            # Find the role by name or key
-            next_speaker_found = False
-            for key, role in active_roles.items():
-                if role["name"] == request.next_speaker or key == request.next_speaker:
-                    next_speaker_found = True
-                    break
+            # If we have a next speaker specified, only that role should respond
+            if request.next_speaker:
+                response = await gemini_service.get_role_response(
+                    role=request.next_speaker,
+                    topic=request.topic,
+                    context=conversation,
+                    max_tokens=request.max_tokens,
+                    on_event=on_event
+                )
+                conversation.append(response)
+                # Any active role may be picked next; prepare their turns while the user decides
+                gemini_service.speculate_next_turns(
+                    conversation,
+                    list(active_roles.values()),
+                    lambda role: gemini_service.prompts.for_role(role).discuss(request.topic),
+                    request.max_tokens,
+                )
+                return conversation.messages[start:]
             
-            if not next_speaker_found:
-                raise HTTPException(status_code=404, detail=f"Next speaker {request.next_speaker} not found in active roles")
+            # If we have user input, add it to the conversation
+            if request.user_input:
+                conversation.append({"role": "user", "content": request.user_input})
+                if on_event is not None:
+                    await on_event({"type": "message", "message": conversation[-1]})
             
-            # Get response from the specified role
-            response = await gemini_service.get_role_response(
-                role=request.next_speaker,
+            # Generate the conversation turns
+            await gemini_service.generate_conversation(
                 topic=request.topic,
-                context=request.conversation_history or [],
-                max_tokens=request.max_tokens
+                roles=active_roles,
+                max_turns=request.max_turns,
+                max_tokens=request.max_tokens,
+                conversation_history=conversation,
+                parallel=request.parallel,
+                on_event=on_event
             )
-            return {"conversation": [response]}
-        
-        # If we have user input, add it to the conversation
-        if request.user_input:
-            conversation = request.conversation_history or []
-            conversation.append({"role": "user", "content": request.user_input})
-        else:
-            conversation = []
-        
-        # Generate full conversation
-        full_conversation = await gemini_service.generate_conversation(
-            topic=request.topic,
-            roles=active_roles,
-            max_turns=request.max_turns,
-            max_tokens=request.max_tokens,
-            conversation_history=conversation
-        )
-        return {"conversation": full_conversation}
+            return conversation.messages[start:]
+        finally:
+            await session_store.append(session, conversation.messages[start:])
+
+def conversation_seed(request: ConversationRequest) -> List[Dict[str, str]]:
+    """Client-sent history a new session starts from (only used by turn-based requests)."""
+    if request.user_input or request.next_speaker:
+        return request.conversation_history or []
+    return []
+
+async def cancel_on_disconnect(http_request: Request, work: Any, interval: float = 0.5) -> Any:
+    """Await ``work``, cancelling it (and its in-flight model calls) if the client disconnects.
+
+    Returns the work's result, or None once a cancelled work has finished
+    unwinding (so its cleanup, e.g. saving the session, still runs).
+    """
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=interval)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                return None
+    finally:
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+@app.post("/api/ai/conversation")
+async def start_conversation(request: ConversationRequest, http_request: Request):
+    """Start or continue a conversation with multiple AI roles.
+
+    Returns the messages added by this request and the session ID to pass on
+    the next request instead of the full conversation history. Generation
+    stops if the client disconnects; use /api/ai/jobs for long conversations.
+    """
+    try:
+        active_roles = resolve_active_roles(request)
+        session = await open_session(request.session_id, request.topic, conversation_seed(request))
+        conversation = await cancel_on_disconnect(http_request, run_conversation(request, active_roles, session))
+        return {"conversation": conversation, "session_id": session.id}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in conversation: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to generate conversation: {str(e)}")
 
+@app.post("/api/ai/conversation/stream")
+async def stream_conversation(request: ConversationRequest):
+    """Stream a conversation as newline-delimited JSON events.
+
+    Emits a ``session`` event with the session ID, ``delta`` events with text
+    as it is generated, a ``message`` event for every completed turn, then a
+    final ``done`` (or ``error``) event.
+    """
+    active_roles = resolve_active_roles(request)
+    session = await open_session(request.session_id, request.topic, conversation_seed(request))
+
+    async def events():
+        yield json.dumps({"type": "session", "session_id": session.id}) + "\n"
+        try:
+            async for event in stream_events(lambda on_event: run_conversation(request, active_roles, session, on_event)):
+                yield json.dumps(event) + "\n"
+            yield json.dumps({"type": "done"}) + "\n"
+        except Exception as e:
+            print(f"Error in streamed conversation: {str(e)}")
+            yield json.dumps({"type": "error", "detail": f"Failed to generate conversation: {str(e)}"}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.post("/api/ai/jobs", status_code=202)
+async def submit_conversation_job(request: JobRequest):
+    """Start a conversation in the background and return its job ID immediately.
+
+    Poll GET /api/ai/jobs/{job_id} for progress; a job nobody polls for
+    JOB_IDLE_TIMEOUT seconds is cancelled.
+    """
+    active_roles = resolve_active_roles(request)
+    session = await open_session(request.session_id, request.topic, conversation_seed(request))
+    try:
+        job = job_manager.submit(
+            lambda on_event: run_conversation(request, active_roles, session, on_event),
+            deadline=request.deadline,
+            session_id=session.id,
+        )
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"job_id": job.id, "session_id": session.id, "status": job.status}
+
+@app.get("/api/ai/jobs/{job_id}")
+async def get_conversation_job(job_id: str, since: int = Query(0, ge=0)):
+    """Job status with the messages completed after the first ``since`` and the text of replies in progress."""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_dict(since)
+
+@app.post("/api/ai/jobs/{job_id}/cancel")
+async def cancel_conversation_job(job_id: str):
+    """Cancel a queued or running job; messages completed so far stay in its session."""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_dict()
+
+@app.websocket("/ws/conversation")
+async def conversation_socket(websocket: WebSocket):
+    """Conversations over one WebSocket, several at a time, each identified by a client-chosen ``id``.
+
+    Client messages:
+      {"type": "start", "id", ...ConversationRequest fields}: start (or, with
+        session_id, continue) a conversation and generate its turns
+      {"type": "turn", "id", "user_input"?, "next_speaker"?}: generate the next
+        turns of a started conversation with its original settings
+      {"type": "cancel", "id"}: stop generating for that conversation
+
+    Server events carry the same ``id``: ``session``, ``delta``, ``message``,
+    then ``done``, ``error`` or ``cancelled``. Generation waits while the
+    client is not reading them (bounded send queue).
+    """
+    channel = SocketChannel(websocket)
+    # Settings and session of each conversation started on this socket
+    conversations: Dict[str, ConversationRequest] = {}
+
+    async def run(stream_id: str, request: ConversationRequest, on_event: EventCallback) -> None:
+        active_roles = resolve_active_roles(request)
+        session = await open_session(request.session_id, request.topic, conversation_seed(request))
+        conversations[stream_id] = request.model_copy(update={"session_id": session.id, "user_input": None, "next_speaker": None})
+        await on_event({"type": "session", "session_id": session.id})
+        await run_conversation(request, active_roles, session, on_event)
+
+    def handle(message: Dict[str, Any]) -> None:
+        kind, stream_id = message.get("type"), message.get("id")
+        if not isinstance(stream_id, str):
+            channel.reply(None, {"type": "error", "detail": "Every message needs a string id"})
+            return
+        if kind == "cancel":
+            if not channel.cancel(stream_id):
+                channel.reply(stream_id, {"type": "error", "detail": "Nothing to cancel"})
+            return
+        if channel.busy(stream_id):
+            channel.reply(stream_id, {"type": "error", "detail": "Conversation is still generating"})
+            return
+        fields = {key: value for key, value in message.items() if key not in ("type", "id")}
+        try:
+            if kind == "start":
+                request = ConversationRequest(**fields)
+            elif kind == "turn":
+                if stream_id not in conversations:
+                    raise ValueError(f"Conversation {stream_id} has not been started")
+                request = ConversationRequest(**{
+                    **conversations[stream_id].model_dump(),
+                    "user_input": fields.get("user_input"),
+                    "next_speaker": fields.get("next_speaker"),
+                })
+            else:
+                raise ValueError(f"Unknown message type {kind}")
+        except (ValidationError, ValueError) as e:
+            channel.reply(stream_id, {"type": "error", "detail": str(e)})
+            return
+        channel.start(stream_id, lambda on_event: run(stream_id, request, on_event))
+
+    await channel.serve(handle)
+
+@app.get("/api/ai/sessions/{session_id}")
+async def get_session(session_id: str):
+    """Get the full transcript of a conversation session."""
+    return (await open_session(session_id, "")).to_dict()
+
+@app.delete("/api/ai/sessions/{session_id}")
+async def delete_session(session_id: str):
+    """Delete a conversation session."""
+    if not await session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    return {"message": "Session deleted successfully"}
+
 @app.post("/api/ai/test-role")
 async def test_role(request: TestRoleRequest):
     """Test a single role with a question."""
-    roles_data = load_roles()
-    if request.role_name not in roles_data["roles"]:
+    resolved = role_registry.resolve(request.role_name)
+    if not resolved:
         raise HTTPException(status_code=404, detail="Role not found")
     
-    role = roles_data["roles"][request.role_name]
+    _, role = resolved
+    # The role's description and system prompt are sent as its system instruction
+    max_tokens = request.max_tokens or role['max_tokens']
     try:
-        # Create context that includes the role's description
-        context = f"You are acting as a {role['name']} - {role['description']}"
-        if role.get('system_prompt'):
-            context += f"\n\n{role['system_prompt']}"
-        
         response = await gemini_service.generate_response(
             prompt=request.question,
-            context=context,
-            max_tokens=request.max_tokens or role['max_tokens']
+            max_tokens=max_tokens,
+            **gemini_service.role_options(role, max_tokens)
         )
         return {"response": response}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def run_role_tests(request: BatchTestRequest, roles: List[Dict], on_event: EventCallback) -> None:
+    """Answer every (role, question) pair, at most ``concurrency`` at a time, emitting each result as it completes.
+
+    Every call still goes through the service's shared rate limiter and retries.
+    """
+    semaphore = asyncio.Semaphore(max(1, request.concurrency or config.max_concurrent_requests))
+
+    async def run_item(role: Dict, question_index: int, question: str) -> None:
+        async with semaphore:
+            item = {"role": role["name"], "question_index": question_index, "question": question}
+            started = time.perf_counter()
+            max_tokens = request.max_tokens or role['max_tokens']
+            try:
+                generation = await gemini_service.generate(
+                    prompt=question,
+                    max_tokens=max_tokens,
+                    **gemini_service.role_options(role, max_tokens)
+                )
+            except Exception as e:
+                item.update(type="error", detail=str(e), latency=time.perf_counter() - started)
+            else:
+                item.update(
+                    type="result",
+                    response=generation.text,
+                    latency=time.perf_counter() - started,
+                    prompt_tokens=generation.prompt_tokens,
+                    response_tokens=generation.response_tokens,
+                    cached=generation.cached,
+                )
+            await on_event(item)
+
+    await asyncio.gather(*(
+        run_item(role, index, question) for role in roles for index, question in enumerate(request.questions)
+    ))
+
+@app.post("/api/ai/test-roles/batch")
+async def test_roles_batch(request: BatchTestRequest):
+    """Test every role against every question, streaming NDJSON results as they complete.
+
+    Each line is a ``result`` (with latency in seconds and token usage) or an
+    ``error`` for one (role, question) pair; a final ``done`` line has totals.
+    """
+    roles = []
+    for role_name in request.role_names:
+        resolved = role_registry.resolve(role_name)
+        if not resolved:
+            raise HTTPException(status_code=404, detail=f"Role {role_name} not found")
+        roles.append(resolved[1])
+    total = len(roles) * len(request.questions)
+    if total == 0:
+        raise HTTPException(status_code=400, detail="No roles or questions specified")
+    if total > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch of {total} items exceeds the limit of {MAX_BATCH_ITEMS}")
+
+    async def events():
+        started = time.perf_counter()
+        totals = {"results": 0, "errors": 0, "prompt_tokens": 0, "response_tokens": 0}
+        try:
+            async for event in stream_events(lambda on_event: run_role_tests(request, roles, on_event)):
+                if event["type"] == "result":
+                    totals["results"] += 1
+                    totals["prompt_tokens"] += event["prompt_tokens"]
+                    totals["response_tokens"] += event["response_tokens"]
+                else:
+                    totals["errors"] += 1
+                yield json.dumps(event) + "\n"
+            yield json.dumps({"type": "done", "elapsed": time.perf_counter() - started, **totals}) + "\n"
+        except Exception as e:
+            print(f"Error in batch role test: {str(e)}")
+            yield json.dumps({"type": "error", "detail": f"Failed to run batch: {str(e)}"}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+def next_turn_candidates(request: NextTurnRequest, conversation: Conversation) -> List[Dict]:
+    """Roles that may be picked after this turn: the requested active roles, else everyone who has spoken."""
+    names = request.active_roles
+    if names is None:
+        names = {speaker_name(message) for message in conversation} - {None}
+    candidates = []
+    for name in names:
+        resolved = role_registry.resolve(name)
+        if resolved:
+            candidates.append(resolved[1])
+    return candidates
+
 @app.post("/api/ai/next-turn")
 async def next_turn(request: NextTurnRequest):
     """Generate the next turn in a manual, turn-based conversation."""
-    roles_data = load_roles()
-    # Try to find the role by display name or key
-    role_found = None
-    for key, role in roles_data["roles"].items():
-        if role["name"] == request.next_speaker or key == request.next_speaker:
-            role_found = role
-            break
-    if not role_found:
+    # Find the role by display name or key
+    resolved = role_registry.resolve(request.next_speaker)
+    if not resolved:
         raise HTTPException(status_code=404, detail=f"Role '{request.next_speaker}' not found")
+    _, role_found = resolved
 
-    # Build context from conversation history
-    context = ""
-    for msg in request.conversation_history:
-        context += f"{msg['role']}: {msg['content']}\n"
-    if role_found.get('system_prompt'):
-        context += f"\n{role_found['system_prompt']}"
+    # The conversation history is sent as context and the role's system prompt as its
+    # system instruction, so the prompt is just the topic
+    max_tokens = request.max_tokens or role_found['max_tokens']
 
-    try:
-        response = await gemini_service.generate_response(
-            prompt=request.topic,
-            context=context,
-            max_tokens=request.max_tokens or role_found['max_tokens']
+    session = await open_session(request.session_id, request.topic, request.conversation_history)
+    async with session.lock:
+        try:
+            response = await gemini_service.role_turn(role_found, request.topic, session.conversation, max_tokens)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        message = gemini_service.format_message("model", f"[{role_found['name']}] {response}")
+        session.conversation.append(message)
+        await session_store.append(session, [message])
+        # Prepare the likely next turns while the user picks the next speaker
+        gemini_service.speculate_next_turns(
+            session.conversation,
+            next_turn_candidates(request, session.conversation),
+            lambda role: request.topic,
+            request.max_tokens,
         )
-        return {"role": role_found["name"], "content": response}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return {"role": role_found["name"], "content": response, "session_id": session.id}
+
+@app.get("/api/ai/stats")
+async def get_ai_stats():
+    """Response cache hit/miss counts, rate limiter, model pool and background job state."""
+    return {**gemini_service.stats(), "jobs": job_manager.stats()}
+
+@app.get("/metrics")
+async def get_metrics():
+    """Metrics in the Prometheus text exposition format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,82 @@
+import json
+import base64
+import binascii
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from .role_registry import RoleStore
+
+class InvalidCursorError(ValueError):
+    """The pagination cursor is malformed or points to a role that no longer exists."""
+
+def encode_cursor(key: str) -> str:
+    return base64.urlsafe_b64encode(key.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        return base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+    except (binascii.Error, UnicodeDecodeError):
+        raise InvalidCursorError(f"Invalid cursor {cursor!r}")
+
+class RoleListCache:
+    """Pre-serialized GET /api/roles response bodies, kept until the roles change.
+
+    Bodies are cached per (fields, cursor, limit) for the current store
+    version, so repeated requests cost a dictionary lookup instead of
+    re-serializing every role. Pages start after the key encoded in the
+    cursor, so it stays valid while other roles are added or removed; a
+    cursor whose own role was removed raises ``InvalidCursorError``.
+    """
+
+    def __init__(self, store: RoleStore, max_entries: int = 64):
+        self.store = store
+        self.max_entries = max_entries
+        self._version: Optional[str] = None
+        self._keys: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._bodies: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _sync(self, version: str) -> None:
+        """Drop cached bodies and rebuild the key order when the roles changed."""
+        if version != self._version:
+            self._keys = list(self.store.load()["roles"])
+            self._positions = {key: i for i, key in enumerate(self._keys)}
+            self._bodies.clear()
+            self._version = version
+
+    def body(self,
+             version: str,
+             fields: Optional[Tuple[str, ...]] = None,
+             cursor: Optional[str] = None,
+             limit: Optional[int] = None) -> bytes:
+        """Serialized ``{"roles": [...]}`` (plus ``next_cursor`` when paginated) for a store version."""
+        self._sync(version)
+        key = (fields, cursor, limit)
+        body = self._bodies.get(key)
+        if body is not None:
+            self._bodies.move_to_end(key)
+            self.hits += 1
+            return body
+        self.misses += 1
+
+        start = 0
+        if cursor:
+            position = self._positions.get(decode_cursor(cursor))
+            if position is None:
+                raise InvalidCursorError(f"Invalid cursor {cursor!r}")
+            start = position + 1
+        end = len(self._keys) if limit is None else min(start + limit, len(self._keys))
+        roles = self.store.load()["roles"]
+        page = [roles[k] for k in self._keys[start:end]]
+        if fields:
+            page = [{field: role[field] for field in fields if field in role} for role in page]
+
+        payload = {"roles": page}
+        if limit is not None:
+            payload["next_cursor"] = encode_cursor(self._keys[end - 1]) if end < len(self._keys) else None
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        self._bodies[key] = body
+        while len(self._bodies) > self.max_entries:
+            self._bodies.popitem(last=False)
+        return body
@@ -0,0 +1,371 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Optional, Tuple, Callable, TypeVar
+
+logger = logging.getLogger('RoleRegistry')
+
+# Default location of the role configuration file
+ROLES_FILE = os.path.join(os.path.dirname(__file__), "config", "roles.json")
+
+T = TypeVar("T")
+
+class RoleStore(ABC):
+    """Storage for role configurations, shared by the API endpoints and the AI services.
+
+    Reads are synchronous and cheap. Changes go through ``mutate``, which
+    serializes them with an asyncio lock. ``version`` changes whenever the
+    roles do and is used as the ETag of the role list.
+    """
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+
+    @staticmethod
+    def normalize(name: str) -> str:
+        """Normalize a role name or key (e.g. "Customer Advocate" -> "customer_advocate")."""
+        return name.strip().lower().replace(" ", "_")
+
+    @abstractmethod
+    def load(self) -> Dict[str, Any]:
+        """Return the current roles document ({"roles": {key: config}}); do not modify it."""
+        pass
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the role configuration stored under the given key."""
+        pass
+
+    @abstractmethod
+    def resolve(self, name: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Resolve a role key, display name or normalized name to (key, config).
+
+        Exact keys win over display names, which win over normalized matches.
+        """
+        pass
+
+    @property
+    @abstractmethod
+    def version(self) -> str:
+        """Opaque version of the roles, changing whenever they change."""
+        pass
+
+    @abstractmethod
+    async def mutate(self, change: Callable[[Dict[str, Dict[str, Any]]], T]) -> T:
+        """Apply ``change`` to a copy of the roles ({key: config}) and return its result.
+
+        Mutations run one at a time, so each sees the previous one's result.
+        ``change`` may add, replace and delete entries but must not modify
+        role configurations in place. If it raises, nothing is modified.
+        """
+        pass
+
+    async def flush(self) -> None:
+        """Write pending changes to storage now (e.g. on shutdown)."""
+        pass
+
+class JSONRoleStore(RoleStore):
+    """In-memory view of roles.json that reloads only when the file changes.
+
+    Changes are applied in memory at once; the file is then rewritten
+    atomically in a worker thread, with changes made within ``write_delay``
+    of each other coalesced into a single write.
+    """
+
+    def __init__(self, path: str = ROLES_FILE, write_delay: float = 0.2):
+        super().__init__()
+        self.path = path
+        self.write_delay = write_delay
+        # Changes applied in memory but not yet written to disk
+        self._dirty = False
+        self._flush_task: Optional[asyncio.Task] = None
+        self.writes = 0
+        self._data: Dict[str, Any] = {"roles": {}}
+        self._payload = ""
+        self._version = ""
+        self._signature = None
+        self.by_key: Dict[str, Dict[str, Any]] = {}
+        self.by_name: Dict[str, str] = {}
+        self.by_normalized: Dict[str, str] = {}
+
+    def _stat_signature(self):
+        """Return (mtime, inode, size) of the roles file, or None if it is missing."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+
+    def _load(self, signature) -> None:
+        """Read the roles file and rebuild the lookup indexes."""
+        data = {"roles": {}}
+        payload = ""
+        if signature is not None:
+            try:
+                with open(self.path, 'r') as f:
+                    payload = f.read()
+                data = json.loads(payload)
+            except Exception as e:
+                logger.error("Error loading roles: %s", e)
+                data = {"roles": {}}
+        data.setdefault("roles", {})
+        self._set_data(data, payload)
+        self._signature = signature
+
+    def _set_data(self, data: Dict[str, Any], payload: str) -> None:
+        """Swap in a new roles document and rebuild the indexes."""
+        roles = data["roles"]
+        by_name = {}
+        by_normalized = {}
+        for key, role in roles.items():
+            by_normalized.setdefault(self.normalize(key), key)
+            name = role.get("name")
+            if name:
+                by_name.setdefault(name, key)
+                by_normalized.setdefault(self.normalize(name), key)
+        self._data = data
+        self._payload = payload
+        self._version = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+        self.by_key = roles
+        self.by_name = by_name
+        self.by_normalized = by_normalized
+
+    def refresh(self) -> None:
+        """Reload the roles file if its mtime, inode or size changed."""
+        if self._dirty:
+            # The in-memory roles are newer than the file until they are flushed
+            return
+        signature = self._stat_signature()
+        if signature != self._signature:
+            self._load(signature)
+
+    def load(self) -> Dict[str, Any]:
+        self.refresh()
+        return self._data
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        self.refresh()
+        return self.by_key.get(key)
+
+    def resolve(self, name: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Resolve a role key, display name or normalized name to (key, config) in constant time."""
+        self.refresh()
+        if not name:
+            return None
+        key = name if name in self.by_key else self.by_name.get(name)
+        if key is None:
+            key = self.by_normalized.get(self.normalize(name))
+        if key is None:
+            return None
+        return key, self.by_key[key]
+
+    @property
+    def version(self) -> str:
+        """Hash of the roles document."""
+        self.refresh()
+        return self._version
+
+    def _write_file(self, payload: str) -> None:
+        """Atomically replace the roles file: write a temp file, fsync it, rename it over (blocking)."""
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".roles-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        # Make the rename itself durable
+        if hasattr(os, "O_DIRECTORY"):
+            dir_fd = os.open(directory, os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        self.writes += 1
+
+    async def mutate(self, change: Callable[[Dict[str, Dict[str, Any]]], T]) -> T:
+        """Apply ``change`` in memory now; the write to disk is scheduled and coalesced."""
+        async with self.lock:
+            current = self.load()
+            roles = dict(current["roles"])
+            result = change(roles)
+            data = {**current, "roles": roles}
+            self._set_data(data, json.dumps(data, indent=2))
+            self._dirty = True
+            if self._flush_task is None or self._flush_task.done():
+                self._flush_task = asyncio.create_task(self._flush_later())
+        return result
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.write_delay)
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error("Error saving roles: %s", e)
+
+    async def flush(self) -> None:
+        async with self.lock:
+            if not self._dirty:
+                return
+            await asyncio.to_thread(self._write_file, self._payload)
+            self._dirty = False
+            self._signature = self._stat_signature()
+
+class SQLiteRoleStore(RoleStore):
+    """Roles stored one row each in SQLite, for large role sets and several writers.
+
+    Keys and display names are looked up through indexes, and a mutation
+    only writes the rows it changed. Every row carries an ``updated_at``
+    version; the store's version is derived from the row count and the
+    latest ``updated_at``. The full role list is cached in memory until
+    another connection commits a change.
+    """
+
+    def __init__(self, path: str, seed_file: Optional[str] = ROLES_FILE):
+        super().__init__()
+        self.path = path
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._cache: Optional[Dict[str, Any]] = None
+        self._cache_data_version = None
+        self._version = ""
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS roles ("
+                "key TEXT PRIMARY KEY, name TEXT NOT NULL, normalized_key TEXT NOT NULL, "
+                "normalized_name TEXT NOT NULL, position INTEGER NOT NULL, config TEXT NOT NULL, "
+                "updated_at INTEGER NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS roles_name ON roles (name)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS roles_normalized_key ON roles (normalized_key)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS roles_normalized_name ON roles (normalized_name)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS roles_position ON roles (position)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS roles_updated_at ON roles (updated_at)")
+        if seed_file:
+            self._seed(seed_file)
+
+    def _seed(self, seed_file: str) -> None:
+        """Import roles.json into an empty database."""
+        with self._db_lock:
+            if self._db.execute("SELECT 1 FROM roles LIMIT 1").fetchone():
+                return
+        try:
+            with open(seed_file, 'r') as f:
+                roles = json.load(f).get("roles", {})
+        except (OSError, ValueError) as e:
+            logger.warning("Could not seed roles from %s: %s", seed_file, e)
+            return
+        self._apply({}, roles)
+        logger.info("Seeded %d roles from %s", len(roles), seed_file)
+
+    def _row(self, key: str, role: Dict[str, Any], position: int, updated_at: int) -> tuple:
+        name = role.get("name") or key
+        return (key, name, self.normalize(key), self.normalize(name), position, json.dumps(role), updated_at)
+
+    def _query_one(self, sql: str, params: tuple) -> Optional[Tuple[str, Dict[str, Any]]]:
+        with self._db_lock:
+            row = self._db.execute(sql, params).fetchone()
+        return None if row is None else (row[0], json.loads(row[1]))
+
+    def _data_version(self) -> int:
+        """Changes whenever another connection commits (own commits update the cache directly)."""
+        with self._db_lock:
+            return self._db.execute("PRAGMA data_version").fetchone()[0]
+
+    def _read_version(self) -> str:
+        with self._db_lock:
+            count, latest = self._db.execute("SELECT COUNT(*), MAX(updated_at) FROM roles").fetchone()
+        return f"{count}-{latest or 0}"
+
+    def load(self) -> Dict[str, Any]:
+        data_version = self._data_version()
+        if self._cache is None or data_version != self._cache_data_version:
+            with self._db_lock:
+                rows = self._db.execute("SELECT key, config FROM roles ORDER BY position").fetchall()
+            self._cache = {"roles": {key: json.loads(config) for key, config in rows}}
+            self._cache_data_version = data_version
+            self._version = self._read_version()
+        return self._cache
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        found = self._query_one("SELECT key, config FROM roles WHERE key = ?", (key,))
+        return found[1] if found else None
+
+    def resolve(self, name: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        if not name:
+            return None
+        normalized = self.normalize(name)
+        return (
+            self._query_one("SELECT key, config FROM roles WHERE key = ?", (name,))
+            or self._query_one("SELECT key, config FROM roles WHERE name = ? ORDER BY position LIMIT 1", (name,))
+            or self._query_one(
+                "SELECT key, config FROM roles WHERE normalized_key = ? OR normalized_name = ? "
+                "ORDER BY position LIMIT 1", (normalized, normalized)
+            )
+        )
+
+    @property
+    def version(self) -> str:
+        """Row count and latest ``updated_at``."""
+        self.load()
+        return self._version
+
+    def _apply(self, before: Dict[str, Dict[str, Any]], after: Dict[str, Dict[str, Any]]) -> str:
+        """Write only the rows that differ between two role sets (blocking); return the new version."""
+        deleted = [(key,) for key in before if key not in after]
+        changed = [(key, role) for key, role in after.items() if before.get(key) is not role]
+        with self._db_lock, self._db:
+            latest, next_position = self._db.execute(
+                "SELECT COALESCE(MAX(updated_at), 0), COALESCE(MAX(position), -1) + 1 FROM roles"
+            ).fetchone()
+            # Versions must increase even if the clock does not
+            updated_at = max(time.time_ns(), latest + 1)
+            self._db.executemany("DELETE FROM roles WHERE key = ?", deleted)
+            for key, role in changed:
+                row = self._db.execute("SELECT position FROM roles WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    position, next_position = next_position, next_position + 1
+                else:
+                    position = row[0]
+                self._db.execute(
+                    "INSERT OR REPLACE INTO roles (key, name, normalized_key, normalized_name, position, config, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", self._row(key, role, position, updated_at)
+                )
+        return self._read_version()
+
+    async def mutate(self, change: Callable[[Dict[str, Dict[str, Any]]], T]) -> T:
+        """Apply ``change`` and write the rows it touched in a single transaction."""
+        async with self.lock:
+            before = await asyncio.to_thread(lambda: self.load()["roles"])
+            roles = dict(before)
+            result = change(roles)
+            version = await asyncio.to_thread(self._apply, before, roles)
+            self._cache = {"roles": roles}
+            self._cache_data_version = await asyncio.to_thread(self._data_version)
+            self._version = version
+        return result
+
+def create_role_store() -> RoleStore:
+    """Role store selected by ROLE_STORE ("json" or "sqlite")."""
+    if os.getenv("ROLE_STORE", "json") == "sqlite":
+        path = os.getenv("ROLE_DB_PATH", os.path.join(os.path.dirname(__file__), "roles.db"))
+        return SQLiteRoleStore(path)
+    return JSONRoleStore()
+
+# Shared role store used by both the API endpoints and the AI services
+role_registry = create_role_store()
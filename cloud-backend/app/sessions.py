@@ -0,0 +1,184 @@
+import os
+import time
+import uuid
+import asyncio
+import sqlite3
+import threading
+import weakref
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from .ai_services.conversation import Conversation
+
+class Session:
+    """Server-side conversation state, so clients only send each turn's new input."""
+
+    def __init__(self, session_id: str, topic: str = "", conversation: Optional[Conversation] = None):
+        self.id = session_id
+        self.topic = topic
+        self.conversation = conversation or Conversation()
+        self.updated_at = time.time()
+        # Turns of one session are generated one at a time
+        self.lock = asyncio.Lock()
+
+    def to_dict(self) -> Dict:
+        return {
+            "session_id": self.id,
+            "topic": self.topic,
+            "conversation": self.conversation.messages,
+            "updated_at": self.updated_at,
+        }
+
+class SessionStore(ABC):
+    @abstractmethod
+    async def create(self, topic: str = "", messages: Optional[List[Dict[str, str]]] = None) -> Session:
+        """Create a session, optionally seeded with existing messages."""
+        pass
+
+    @abstractmethod
+    async def get(self, session_id: str) -> Optional[Session]:
+        """Return the session, or None if it does not exist (or was evicted)."""
+        pass
+
+    @abstractmethod
+    async def append(self, session: Session, messages: List[Dict[str, str]]) -> None:
+        """Persist messages that were already appended to the session's conversation."""
+        pass
+
+    @abstractmethod
+    async def delete(self, session_id: str) -> bool:
+        """Delete a session; return whether it existed."""
+        pass
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+class InMemorySessionStore(SessionStore):
+    """Sessions kept in process memory, evicting the least recently used."""
+
+    def __init__(self, max_sessions: int = 1000):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+
+    def _remember(self, session: Session) -> None:
+        self._sessions[session.id] = session
+        self._sessions.move_to_end(session.id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    async def create(self, topic: str = "", messages: Optional[List[Dict[str, str]]] = None) -> Session:
+        session = Session(self.new_id(), topic, Conversation(messages))
+        self._remember(session)
+        return session
+
+    async def get(self, session_id: str) -> Optional[Session]:
+        session = self._sessions.get(session_id)
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+        return session
+
+    async def append(self, session: Session, messages: List[Dict[str, str]]) -> None:
+        session.updated_at = time.time()
+
+    async def delete(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+class SQLiteSessionStore(InMemorySessionStore):
+    """Sessions persisted to SQLite, with the most recently used kept in memory.
+
+    Messages are stored one row each, so a turn only inserts its new messages
+    instead of rewriting the transcript. Database calls run in a worker thread.
+    A session evicted from memory while a request still holds it is handed
+    out again rather than reloaded, so its turns keep sharing one lock.
+    """
+
+    def __init__(self, path: str, max_sessions: int = 1000):
+        super().__init__(max_sessions)
+        self.path = path
+        # Every session object still referenced somewhere, evicted or not
+        self._live: "weakref.WeakValueDictionary[str, Session]" = weakref.WeakValueDictionary()
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "id TEXT PRIMARY KEY, topic TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS session_messages ("
+                "session_id TEXT NOT NULL, seq INTEGER NOT NULL, role TEXT NOT NULL, content TEXT NOT NULL, "
+                "PRIMARY KEY (session_id, seq))"
+            )
+
+    def _insert_messages(self, session_id: str, first_seq: int, messages: List[Dict[str, str]], updated_at: float) -> None:
+        with self._db_lock, self._db:
+            self._db.executemany(
+                "INSERT INTO session_messages (session_id, seq, role, content) VALUES (?, ?, ?, ?)",
+                [(session_id, first_seq + i, msg["role"], msg["content"]) for i, msg in enumerate(messages)],
+            )
+            self._db.execute("UPDATE sessions SET updated_at = ? WHERE id = ?", (updated_at, session_id))
+
+    def _insert_session(self, session: Session) -> None:
+        with self._db_lock, self._db:
+            self._db.execute(
+                "INSERT INTO sessions (id, topic, updated_at) VALUES (?, ?, ?)",
+                (session.id, session.topic, session.updated_at),
+            )
+        self._insert_messages(session.id, 0, session.conversation.messages, session.updated_at)
+
+    def _load_session(self, session_id: str) -> Optional[Session]:
+        with self._db_lock:
+            row = self._db.execute("SELECT topic, updated_at FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            rows = self._db.execute(
+                "SELECT role, content FROM session_messages WHERE session_id = ? ORDER BY seq", (session_id,)
+            ).fetchall()
+        session = Session(session_id, row[0], Conversation({"role": role, "content": content} for role, content in rows))
+        session.updated_at = row[1]
+        return session
+
+    def _delete_session(self, session_id: str) -> bool:
+        with self._db_lock, self._db:
+            self._db.execute("DELETE FROM session_messages WHERE session_id = ?", (session_id,))
+            return self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,)).rowcount > 0
+
+    async def create(self, topic: str = "", messages: Optional[List[Dict[str, str]]] = None) -> Session:
+        session = await super().create(topic, messages)
+        await asyncio.to_thread(self._insert_session, session)
+        self._live[session.id] = session
+        return session
+
+    async def get(self, session_id: str) -> Optional[Session]:
+        session = await super().get(session_id)
+        if session is not None:
+            return session
+        session = self._live.get(session_id)
+        if session is None:
+            loaded = await asyncio.to_thread(self._load_session, session_id)
+            # Another request may have loaded it while this one was reading
+            session = self._live.get(session_id) or loaded
+            if session is None:
+                return None
+            self._live[session_id] = session
+        self._remember(session)
+        return session
+
+    async def append(self, session: Session, messages: List[Dict[str, str]]) -> None:
+        await super().append(session, messages)
+        first_seq = len(session.conversation) - len(messages)
+        await asyncio.to_thread(self._insert_messages, session.id, first_seq, messages, session.updated_at)
+
+    async def delete(self, session_id: str) -> bool:
+        in_memory = await super().delete(session_id)
+        self._live.pop(session_id, None)
+        return await asyncio.to_thread(self._delete_session, session_id) or in_memory
+
+def create_session_store() -> SessionStore:
+    """Session store selected by SESSION_STORE ("memory" or "sqlite")."""
+    max_sessions = int(os.getenv("MAX_SESSIONS", "1000"))
+    if os.getenv("SESSION_STORE", "memory") == "sqlite":
+        path = os.getenv("SESSION_DB_PATH", os.path.join(os.path.dirname(__file__), "sessions.db"))
+        return SQLiteSessionStore(path, max_sessions)
+    return InMemorySessionStore(max_sessions)
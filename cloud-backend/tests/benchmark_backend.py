@@ -0,0 +1,114 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+# Add the parent directory to the Python path so we can import our modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of already sorted values."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def endpoint_requests(roles):
+    """(method, path, body for the i-th request) for each benchmarked endpoint.
+
+    Topics differ per request so identical in-flight calls are not coalesced
+    into one upstream call.
+    """
+    speakers = roles[:2]
+    history = [
+        {"role": "user", "content": "Let's discuss the following topic: adopting AI in customer support"},
+        {"role": "model", "content": f"[{speakers[0]}] We should start with a small pilot."},
+    ]
+    return {
+        "conversation": ("POST", "/api/ai/conversation", lambda i: {
+            "topic": f"Adopting AI in customer support #{i}",
+            "max_turns": 1,
+            "max_tokens": 100,
+            "active_roles": speakers,
+        }),
+        "next-turn": ("POST", "/api/ai/next-turn", lambda i: {
+            "conversation_history": history,
+            "next_speaker": speakers[-1],
+            "topic": f"Adopting AI in customer support #{i}",
+            "max_tokens": 100,
+        }),
+        "roles": ("GET", "/api/roles", lambda i: None),
+    }
+
+async def run_endpoint(client, method, path, body, total, concurrency):
+    """Send ``total`` requests with ``concurrency`` in flight; return (latencies, errors, elapsed)."""
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in remaining:
+            start = time.perf_counter()
+            response = await client.request(method, path, json=body(i))
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return sorted(latencies), errors, time.perf_counter() - start
+
+async def run(args):
+    import httpx
+    from app import main
+    from app.ai_services.rate_limiter import ModelRateLimits
+
+    # Measure the backend itself unless a quota is asked for explicitly
+    main.gemini_service.rate_limits = ModelRateLimits(args.rpm, args.tpm)
+    await main.gemini_service.validate_model()
+    roles = [role["name"] for role in main.role_registry.load()["roles"].values()]
+    requests = endpoint_requests(roles)
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        print(f"{'endpoint':<14} {'requests':>8} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8}")
+        for name in args.endpoints:
+            method, path, body = requests[name]
+            latencies, errors, elapsed = await run_endpoint(client, method, path, body, args.requests, args.concurrency)
+            print(
+                f"{name:<14} {len(latencies):>8} {errors:>6} "
+                f"{percentile(latencies, 0.50) * 1000:>8.1f} {percentile(latencies, 0.95) * 1000:>8.1f} "
+                f"{percentile(latencies, 0.99) * 1000:>8.1f} {len(latencies) / elapsed:>8.1f}"
+            )
+
+def main():
+    """Benchmark the API offline against the simulated model backend."""
+    parser = argparse.ArgumentParser(description='Benchmark backend endpoints with a fake Gemini backend')
+    parser.add_argument('--endpoints', nargs='+', default=['conversation', 'next-turn', 'roles'],
+                        choices=['conversation', 'next-turn', 'roles'], help='Endpoints to benchmark')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=16, help='Requests in flight at once')
+    parser.add_argument('--latency', type=float, default=0.05, help='Simulated time to first token (s)')
+    parser.add_argument('--tokens-per-second', type=float, default=2000, help='Simulated generation speed')
+    parser.add_argument('--response-tokens', type=int, default=80, help='Simulated response length')
+    parser.add_argument('--quota-error-rate', type=float, default=0.0, help='Fraction of calls failing with 429')
+    parser.add_argument('--rpm', type=int, default=10**9, help='Client-side requests/minute limit')
+    parser.add_argument('--tpm', type=int, default=10**12, help='Client-side tokens/minute limit')
+    args = parser.parse_args()
+
+    # The service reads its backend settings when app.main is imported
+    os.environ.update({
+        "AI_BACKEND": "fake",
+        "FAKE_LATENCY": str(args.latency),
+        "FAKE_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        "FAKE_RESPONSE_TOKENS": str(args.response_tokens),
+        "FAKE_QUOTA_ERROR_RATE": str(args.quota_error_rate),
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+    })
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import sys
+import time
+import argparse
+from pathlib import Path
+
+# Add the parent directory to the Python path so we can import our modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+import google.ai.generativelanguage as glm
+from google.generativeai.types import content_types
+from app.ai_services.conversation import Conversation
+
+MESSAGE = "This is a representative conversation turn of moderate length. " * 8
+
+def rebuild_history(messages):
+    """The previous approach: convert the whole history on every call."""
+    history = []
+    for msg in messages:
+        role = "user" if msg["role"] == "user" else "model"
+        history.append({"role": role, "parts": [msg["content"]]})
+    return history + [{"role": "user", "parts": ["prompt"]}]
+
+def incremental_history(conversation):
+    """The Conversation approach: reuse the entries converted on append."""
+    return [*conversation.history, {"role": "user", "parts": ["prompt"]}]
+
+def time_call(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1e6
+
+def main():
+    """Compare the per-turn cost of building the model request as history grows."""
+    parser = argparse.ArgumentParser(description='Benchmark history conversion per turn')
+    parser.add_argument('--max-messages', type=int, default=512, help='Largest history size to measure')
+    parser.add_argument('--repeats', type=int, default=50, help='Calls averaged per measurement')
+    args = parser.parse_args()
+
+    # The request is converted to protos the same way the SDK does before sending it
+    def build_request(contents):
+        return glm.GenerateContentRequest(
+            model="models/gemini-2.0-flash-lite", contents=content_types.to_contents(contents)
+        )
+
+    messages = []
+    conversation = Conversation()
+    print(f"{'messages':>9} {'rebuild':>10} {'incremental':>12} {'rebuild+sdk':>12} {'incr.+sdk':>10}  (us/turn)")
+    size = 8
+    while size <= args.max_messages:
+        while len(messages) < size:
+            message = {"role": "model" if len(messages) % 2 else "user", "content": MESSAGE}
+            messages.append(message)
+            conversation.append(message)
+        # Per-turn work on our side: rebuilding vs. converting only the new message
+        new_message = {"role": "user", "content": MESSAGE}
+        rebuild = time_call(lambda: rebuild_history(messages + [new_message]), args.repeats)
+        def append_turn():
+            turn = conversation.prefix(len(conversation))
+            turn.append(new_message)
+            return incremental_history(turn)
+        incremental = time_call(append_turn, args.repeats)
+        # Including the SDK's own request construction, which still copies every entry
+        rebuild_sdk = time_call(lambda: build_request(rebuild_history(messages)), args.repeats)
+        incremental_sdk = time_call(lambda: build_request(incremental_history(conversation)), args.repeats)
+        print(f"{size:>9} {rebuild:>10.1f} {incremental:>12.1f} {rebuild_sdk:>12.1f} {incremental_sdk:>10.1f}")
+        size *= 2
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+# Add the parent directory to the Python path so we can import our modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from fastapi import WebSocketDisconnect
+from app.channel import SocketChannel
+
+class FakeWebSocket:
+    """A client that sends the frames it is given and reads only while ``reading`` is set."""
+
+    def __init__(self):
+        self.incoming: asyncio.Queue = asyncio.Queue()
+        self.sent = []
+        self.reading = asyncio.Event()
+        self.reading.set()
+
+    async def accept(self):
+        pass
+
+    async def receive_text(self) -> str:
+        frame = await self.incoming.get()
+        if frame is None:
+            raise WebSocketDisconnect()
+        return frame
+
+    async def send_text(self, text: str) -> None:
+        await self.reading.wait()
+        self.sent.append(json.loads(text))
+
+    def events(self, stream_id):
+        return [event["type"] for event in self.sent if event["id"] == stream_id]
+
+async def wait_for(condition, timeout: float = 2.0) -> None:
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.005)
+    await asyncio.wait_for(poll(), timeout)
+
+def serve(channel: SocketChannel, produce) -> asyncio.Task:
+    """Serve the channel with start/cancel handling like the /ws/conversation endpoint."""
+    def handle(message):
+        if message["type"] == "cancel":
+            if not channel.cancel(message["id"]):
+                channel.reply(message["id"], {"type": "error", "detail": "Nothing to cancel"})
+        else:
+            channel.start(message["id"], produce)
+    return asyncio.ensure_future(channel.serve(handle))
+
+def test_streams_are_multiplexed_and_end_with_done():
+    async def produce(on_event):
+        for i in range(3):
+            await on_event({"type": "delta", "content": str(i)})
+
+    async def scenario():
+        websocket = FakeWebSocket()
+        server = serve(SocketChannel(websocket), produce)
+        for stream_id in ("a", "b"):
+            websocket.incoming.put_nowait(json.dumps({"type": "start", "id": stream_id}))
+        await wait_for(lambda: "done" in websocket.events("a") and "done" in websocket.events("b"))
+        websocket.incoming.put_nowait(None)
+        await server
+        return websocket
+
+    websocket = asyncio.run(scenario())
+    assert websocket.events("a") == ["delta"] * 3 + ["done"]
+    assert websocket.events("b") == ["delta"] * 3 + ["done"]
+
+def test_invalid_messages_get_an_error_reply():
+    async def scenario():
+        websocket = FakeWebSocket()
+        server = serve(SocketChannel(websocket), None)
+        websocket.incoming.put_nowait("not json")
+        websocket.incoming.put_nowait("[1, 2]")
+        await wait_for(lambda: len(websocket.sent) == 2)
+        websocket.incoming.put_nowait(None)
+        await server
+        return websocket
+
+    websocket = asyncio.run(scenario())
+    assert websocket.events(None) == ["error", "error"]
+
+def test_cancel_is_processed_while_the_client_is_not_reading():
+    produced = []
+    cancelled = []
+
+    async def produce(on_event):
+        try:
+            while True:
+                await on_event({"type": "delta", "content": "x"})
+                produced.append(1)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def scenario():
+        websocket = FakeWebSocket()
+        channel = SocketChannel(websocket, max_queued=4)
+        server = serve(channel, produce)
+        websocket.reading.clear()
+        websocket.incoming.put_nowait(json.dumps({"type": "start", "id": "a"}))
+        await asyncio.sleep(0.05)
+        # The queue is full, so the producer is held back
+        stalled_at = len(produced)
+        assert stalled_at <= 5
+        # The reply to the first message cannot be sent yet; it must not hold up the cancel
+        websocket.incoming.put_nowait(json.dumps({"type": "cancel", "id": "missing"}))
+        websocket.incoming.put_nowait(json.dumps({"type": "cancel", "id": "a"}))
+        await wait_for(lambda: cancelled == [True])
+        assert len(produced) == stalled_at
+        websocket.reading.set()
+        await wait_for(lambda: "error" in websocket.events("missing") and "cancelled" in websocket.events("a"))
+        websocket.incoming.put_nowait(None)
+        await server
+        return websocket, channel
+
+    websocket, channel = asyncio.run(scenario())
+    assert websocket.events("a")[-1] == "cancelled"
+    assert not channel.busy("a")
+
+def test_disconnect_cancels_running_streams():
+    cancelled = []
+
+    async def produce(on_event):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def scenario():
+        websocket = FakeWebSocket()
+        channel = SocketChannel(websocket)
+        server = serve(channel, produce)
+        websocket.incoming.put_nowait(json.dumps({"type": "start", "id": "a"}))
+        await wait_for(lambda: channel.busy("a"))
+        websocket.incoming.put_nowait(None)
+        await asyncio.wait_for(server, 1)
+        return channel
+
+    channel = asyncio.run(scenario())
+    assert cancelled == [True]
+    assert channel.closed and not channel.busy("a")
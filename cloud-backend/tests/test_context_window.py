@@ -0,0 +1,86 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the parent directory to the Python path so we can import our modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.ai_services.context_window import ContextWindow
+from app.ai_services.conversation import Conversation
+
+def conversation(length: int) -> Conversation:
+    """An opening message then alternating turns, each estimated at 10 tokens."""
+    messages = [{"role": "user", "content": "topic".ljust(39, ".")}]
+    for i in range(1, length):
+        messages.append({"role": "model" if i % 2 else "user", "content": f"turn {i}".ljust(39, ".")})
+    return Conversation(messages)
+
+def build(window: ContextWindow, history: Conversation) -> Conversation:
+    return asyncio.run(window.build(history))
+
+def test_full_policy_sends_everything():
+    history = conversation(30)
+    assert build(ContextWindow("full", max_tokens=10), history) is history
+
+def test_sliding_window_keeps_the_opening_and_what_fits_the_budget():
+    history = conversation(20)
+    assert history.token_count(0) == 10
+    window = build(ContextWindow("sliding_window", max_tokens=50), history)
+    # 40 tokens left after the opening message: the last four turns
+    assert window.messages == [history[0]] + history.messages[16:]
+    assert window.token_estimate <= 50
+
+def test_sliding_window_keeps_the_latest_message_even_over_budget():
+    history = conversation(5)
+    window = build(ContextWindow("sliding_window", max_tokens=12), history)
+    assert window.messages == [history[0], history[4]]
+
+def test_short_history_is_sent_whole():
+    history = conversation(4)
+    assert build(ContextWindow("sliding_window", max_tokens=1000), history) is history
+    assert build(ContextWindow("last_turns", keep_turns=10), history) is history
+
+def test_last_turns_keeps_the_opening_and_the_last_turns():
+    history = conversation(20)
+    window = build(ContextWindow("last_turns", keep_turns=3), history)
+    assert window.messages == [history[0]] + history.messages[17:]
+
+def test_unknown_policy_and_summary_without_summarizer_are_rejected():
+    with pytest.raises(ValueError):
+        ContextWindow("everything")
+    with pytest.raises(ValueError):
+        ContextWindow("summary")
+
+def test_summary_replaces_dropped_turns_and_is_reused():
+    calls = []
+
+    async def summarizer(previous, messages):
+        calls.append((previous, [message["content"] for message in messages]))
+        return f"summary {len(calls)}"
+
+    async def scenario():
+        window = ContextWindow("summary", max_tokens=100, summarizer=summarizer, summary_chunk=8)
+        history = conversation(20)
+        first = await window.build(history)
+        # The same history and the next turns within the same chunk reuse the summary
+        again = await window.build(history)
+        history.append({"role": "model", "content": "turn 20".ljust(39, ".")})
+        next_turn = await window.build(history)
+        # Once the window moves past the chunk, the summary is extended, not regenerated
+        for i in range(21, 26):
+            history.append({"role": "user", "content": f"turn {i}".ljust(39, ".")})
+        extended = await window.build(history)
+        return history, first, again, next_turn, extended
+
+    history, first, again, next_turn, extended = asyncio.run(scenario())
+    assert first.messages[1] == {"role": "user", "content": "Summary of the earlier discussion: summary 1"}
+    assert first.messages[2:] == history.messages[16:20]
+    assert again.messages == first.messages
+    assert next_turn.messages[1] == first.messages[1]
+    assert len(calls) == 2
+    assert calls[0] == (None, [message["content"] for message in history.messages[1:16]])
+    assert calls[1] == ("summary 1", [message["content"] for message in history.messages[16:24]])
+    assert extended.messages[1]["content"].endswith("summary 2")
+    assert extended.messages[2:] == history.messages[24:]
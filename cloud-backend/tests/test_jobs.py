@@ -0,0 +1,170 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Add the parent directory to the Python path so we can import our modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.jobs import CANCELLED, FAILED, FINISHED, SUCCEEDED, TIMED_OUT, JobManager, JobQueueFullError
+from app.metrics import MetricsRegistry
+
+def manager(**kwargs) -> JobManager:
+    return JobManager(registry=MetricsRegistry(), **kwargs)
+
+async def wait_finished(job, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while job.status not in FINISHED:
+        assert time.monotonic() < deadline, f"job still {job.status}"
+        await asyncio.sleep(0.01)
+
+def test_job_collects_events_and_succeeds():
+    async def run(on_event):
+        await on_event({"type": "delta", "role": "A", "content": "Hel"})
+        await on_event({"type": "message", "message": {"role": "model", "content": "[A] Hello"}})
+
+    async def scenario():
+        jobs = manager()
+        job = jobs.submit(run)
+        await wait_finished(job)
+        await jobs.stop()
+        return job
+
+    job = asyncio.run(scenario())
+    assert job.status == SUCCEEDED
+    assert job.to_dict(since=0)["messages"] == [{"role": "model", "content": "[A] Hello"}]
+    assert job.to_dict(since=1)["messages"] == [] and job.partial == {}
+
+def test_failed_job_records_the_error():
+    async def run(on_event):
+        raise ValueError("model unavailable")
+
+    async def scenario():
+        jobs = manager()
+        job = jobs.submit(run)
+        await wait_finished(job)
+        await jobs.stop()
+        return job
+
+    job = asyncio.run(scenario())
+    assert job.status == FAILED
+    assert job.error == "model unavailable"
+
+def test_deadline_stops_a_running_job():
+    cleaned_up = []
+
+    async def run(on_event):
+        try:
+            await asyncio.sleep(10)
+        finally:
+            cleaned_up.append(True)
+
+    async def scenario():
+        jobs = manager(deadline=0.1)
+        job = jobs.submit(run)
+        await wait_finished(job)
+        await jobs.stop()
+        return job
+
+    job = asyncio.run(scenario())
+    assert job.status == TIMED_OUT
+    assert cleaned_up == [True]
+
+def test_job_past_its_deadline_in_the_queue_never_runs():
+    started = []
+
+    async def slow(on_event):
+        await asyncio.sleep(0.2)
+
+    async def record(on_event):
+        started.append(True)
+
+    async def scenario():
+        jobs = manager(workers=1)
+        first = jobs.submit(slow)
+        queued = jobs.submit(record, deadline=0.05)
+        await wait_finished(queued)
+        await wait_finished(first)
+        await jobs.stop()
+        return queued
+
+    queued = asyncio.run(scenario())
+    assert queued.status == TIMED_OUT
+    assert started == []
+
+def test_cancel_running_and_queued_jobs():
+    async def run(on_event):
+        await asyncio.sleep(10)
+
+    async def scenario():
+        jobs = manager(workers=1)
+        running = jobs.submit(run)
+        queued = jobs.submit(run)
+        await asyncio.sleep(0.05)
+        jobs.cancel(running.id)
+        jobs.cancel(queued.id)
+        await wait_finished(running)
+        await jobs.stop()
+        return running, queued
+
+    running, queued = asyncio.run(scenario())
+    assert (running.status, running.error) == (CANCELLED, "Cancelled by client")
+    assert (queued.status, queued.error) == (CANCELLED, "Cancelled by client")
+
+def test_unpolled_job_is_abandoned():
+    async def run(on_event):
+        await asyncio.sleep(10)
+
+    async def scenario():
+        jobs = manager(idle_timeout=30)
+        job = jobs.submit(run)
+        await asyncio.sleep(0.05)
+        job.last_polled -= 60
+        jobs._reap()
+        await wait_finished(job)
+        await jobs.stop()
+        return job
+
+    job = asyncio.run(scenario())
+    assert job.status == CANCELLED
+    assert job.error.startswith("Abandoned")
+
+def test_full_queue_rejects_jobs():
+    async def run(on_event):
+        await asyncio.sleep(10)
+
+    async def scenario():
+        jobs = manager(workers=1, max_queued=1)
+        jobs.submit(run)
+        await asyncio.sleep(0.05)
+        jobs.submit(run)
+        try:
+            with pytest.raises(JobQueueFullError):
+                jobs.submit(run)
+        finally:
+            await jobs.stop()
+
+    asyncio.run(scenario())
+
+def test_stop_finishes_running_jobs():
+    cleaned_up = []
+
+    async def run(on_event):
+        try:
+            await asyncio.sleep(10)
+        finally:
+            cleaned_up.append(True)
+
+    async def scenario():
+        jobs = manager(workers=2)
+        submitted = [jobs.submit(run) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        await jobs.stop()
+        return submitted
+
+    submitted = asyncio.run(scenario())
+    assert [job.status for job in submitted] == [CANCELLED] * 3
+    assert all(job.error == "Server shutting down" for job in submitted)
+    assert cleaned_up == [True, True]
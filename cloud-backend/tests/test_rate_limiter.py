@@ -0,0 +1,70 @@
+import asyncio
+import sys
+from pathlib import Path
+
+# Add the parent directory to the Python path so we can import our modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.ai_services.rate_limiter import ModelRateLimits, RateLimiter, TokenBucket
+
+def test_token_bucket_delay_and_refill():
+    bucket = TokenBucket(capacity=10, refill_per_second=2)
+    now = bucket.updated_at
+    assert bucket.delay_for(10, now) == 0
+    bucket.take(10)
+    assert bucket.delay_for(4, now) == 2.0
+    # Two seconds later four tokens have been refilled
+    assert bucket.delay_for(4, now + 2) == 0
+    # Requests larger than the bucket only wait for a full bucket
+    assert bucket.delay_for(50, now + 2) == 3.0
+
+def test_token_bucket_never_exceeds_capacity():
+    bucket = TokenBucket(capacity=5, refill_per_second=100)
+    bucket.delay_for(0, bucket.updated_at + 60)
+    assert bucket.tokens == 5
+
+def test_acquire_within_budget_does_not_wait():
+    async def scenario():
+        limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=6000)
+        return [await limiter.acquire(100) for _ in range(5)], limiter
+
+    waits, limiter = asyncio.run(scenario())
+    assert waits == [0.0] * 5
+    assert limiter.total_requests == 5
+    assert limiter.total_tokens == 500
+
+def test_acquire_waits_for_the_token_budget():
+    async def scenario():
+        # 100 tokens per second once the initial budget is spent
+        limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=6000)
+        await limiter.acquire(6000)
+        return await limiter.acquire(10), limiter
+
+    waited, limiter = asyncio.run(scenario())
+    assert 0.05 <= waited <= 0.2
+    assert limiter.total_wait_seconds == waited
+    assert limiter.state()["waiting"] == 0
+
+def test_acquire_serves_callers_in_arrival_order():
+    async def scenario():
+        limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=6000)
+        await limiter.acquire(6000)
+        order = []
+
+        async def caller(name, tokens):
+            await limiter.acquire(tokens)
+            order.append(name)
+
+        # The large request arrives first and is not overtaken by the small one
+        await asyncio.gather(caller("large", 20), caller("small", 1))
+        return order
+
+    assert asyncio.run(scenario()) == ["large", "small"]
+
+def test_model_rate_limits_apply_overrides_per_model():
+    limits = ModelRateLimits(30, 1000, {"models/slow": {"requests_per_minute": 5}})
+    assert limits.for_model("models/slow").requests_per_minute == 5
+    assert limits.for_model("models/slow").tokens_per_minute == 1000
+    assert limits.for_model("models/other").requests_per_minute == 30
+    assert limits.for_model("models/other") is limits.for_model("models/other")
+    assert set(limits.state()) == {"models/slow", "models/other"}
@@ -0,0 +1,50 @@
+import sys
+import time
+from pathlib import Path
+
+# Add the parent directory to the Python path so we can import our modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.ai_services.config import AIServiceConfig
+from app.ai_services.gemini_service import GeminiService
+from app.ai_services.response_cache import ResponseCache
+from app.metrics import MetricsRegistry
+
+HISTORY = [{"role": "user", "content": "Is remote work here to stay?"},
+           {"role": "model", "content": "[Analyst] Mostly, yes."}]
+
+def cache_key(service: GeminiService, prompt: str = "And offices?", context=HISTORY,
+              system_instruction: str = "You are the Analyst.") -> str:
+    return service._prepare_request(prompt, context, system_instruction=system_instruction).cache_key
+
+def test_key_depends_on_role_prompt_and_history():
+    service = GeminiService(AIServiceConfig(ai_backend="fake"), registry=MetricsRegistry())
+    key = cache_key(service)
+    assert cache_key(service) == key
+    assert cache_key(service, system_instruction="You are the Critic.") != key
+    assert cache_key(service, prompt="And schools?") != key
+    assert cache_key(service, context=HISTORY[:1]) != key
+    assert cache_key(service, context=[*HISTORY, {"role": "user", "content": "Go on."}]) != key
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = ResponseCache(ttl=60.0)
+    cache.set("key", "reply")
+    now[0] += 59.0
+    assert cache.get("key") == "reply"
+    now[0] += 2.0
+    assert cache.get("key") is None
+    assert cache.stats()["entries"] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.set("first", "1")
+    cache.set("second", "2")
+    # Reading "first" makes "second" the least recently used
+    assert cache.get("first") == "1"
+    cache.set("third", "3")
+    assert cache.get("second") is None
+    assert (cache.get("first"), cache.get("third")) == ("1", "3")
+    assert cache.evictions == 1
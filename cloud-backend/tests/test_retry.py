@@ -0,0 +1,49 @@
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add the parent directory to the Python path so we can import our modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from google.api_core import exceptions as api_exceptions
+from app.ai_services.retry import RetryPolicy, retry_after
+
+def test_error_classification():
+    policy = RetryPolicy()
+    assert policy.is_quota_error(api_exceptions.ResourceExhausted("quota"))
+    assert policy.is_quota_error(api_exceptions.TooManyRequests("slow down"))
+    assert not policy.is_quota_error(api_exceptions.ServiceUnavailable("down"))
+    assert policy.is_retryable(api_exceptions.ResourceExhausted("quota"))
+    assert policy.is_retryable(api_exceptions.ServiceUnavailable("down"))
+    assert policy.is_retryable(asyncio.TimeoutError())
+    assert not policy.is_retryable(api_exceptions.InvalidArgument("bad request"))
+    assert not policy.is_retryable(ValueError("bug"))
+
+def test_backoff_is_jittered_and_capped():
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0)
+    for attempt in range(6):
+        delays = [policy.backoff(attempt) for _ in range(50)]
+        assert all(0 <= delay <= min(5.0, 2 ** attempt) for delay in delays)
+
+def test_at_least_one_attempt():
+    assert RetryPolicy(max_attempts=0).max_attempts == 1
+
+def test_retry_after_from_retry_info():
+    error = SimpleNamespace(details=[SimpleNamespace(retry_delay=SimpleNamespace(seconds=2, nanos=500_000_000))])
+    assert retry_after(error) == 2.5
+
+def test_retry_after_from_header():
+    error = SimpleNamespace(response=SimpleNamespace(headers={"Retry-After": "7"}))
+    assert retry_after(error) == 7.0
+    error = SimpleNamespace(response=SimpleNamespace(headers={"Retry-After": "soon"}))
+    assert retry_after(error) is None
+    assert retry_after(ValueError("no hint")) is None
+
+def test_delay_prefers_server_hint_within_max_delay():
+    policy = RetryPolicy(base_delay=1.0, max_delay=10.0)
+    hinted = SimpleNamespace(response=SimpleNamespace(headers={"Retry-After": "3"}))
+    assert policy.delay_for(hinted, 0) == 3.0
+    too_long = SimpleNamespace(response=SimpleNamespace(headers={"Retry-After": "120"}))
+    assert policy.delay_for(too_long, 0) == 10.0
+    assert 0 <= policy.delay_for(ValueError("no hint"), 2) <= 4.0
@@ -0,0 +1,192 @@
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the parent directory to the Python path so we can import our modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app import role_registry as registry_module
+from app.role_registry import JSONRoleStore, SQLiteRoleStore, create_role_store
+
+def role(name: str, **settings) -> dict:
+    return {"name": name, "system_prompt": f"You are {name}.", **settings}
+
+@pytest.fixture
+def roles_file(tmp_path):
+    path = tmp_path / "roles.json"
+    path.write_text(json.dumps({"roles": {"analyst": role("Analyst")}}, indent=2))
+    return path
+
+def read_roles(path) -> dict:
+    return json.loads(Path(path).read_text())["roles"]
+
+def test_concurrent_mutations_are_not_lost(roles_file):
+    async def scenario():
+        store = JSONRoleStore(str(roles_file), write_delay=0.01)
+
+        def add(key):
+            def change(roles):
+                roles[key] = role(key.title())
+            return change
+
+        await asyncio.gather(*(store.mutate(add(f"role_{i}")) for i in range(20)))
+        await store.flush()
+        return store
+
+    store = asyncio.run(scenario())
+    expected = {"analyst"} | {f"role_{i}" for i in range(20)}
+    assert set(store.load()["roles"]) == expected
+    assert set(read_roles(roles_file)) == expected
+
+def test_burst_of_mutations_is_written_once(roles_file):
+    async def scenario():
+        store = JSONRoleStore(str(roles_file), write_delay=0.05)
+        for i in range(5):
+            await store.mutate(lambda roles, i=i: roles.__setitem__(f"role_{i}", role(f"Role {i}")))
+        # Changed in memory at once, written to disk after the delay
+        assert "role_4" in store.load()["roles"]
+        assert "role_4" not in read_roles(roles_file)
+        await asyncio.sleep(0.2)
+        return store
+
+    store = asyncio.run(scenario())
+    assert store.writes == 1
+    assert len(read_roles(roles_file)) == 6
+
+def test_failed_change_modifies_nothing(roles_file):
+    async def scenario():
+        store = JSONRoleStore(str(roles_file), write_delay=0.01)
+        version = store.version
+
+        def change(roles):
+            roles["broken"] = role("Broken")
+            raise ValueError("invalid role")
+
+        with pytest.raises(ValueError):
+            await store.mutate(change)
+        return store, version
+
+    store, version = asyncio.run(scenario())
+    assert "broken" not in store.load()["roles"]
+    assert store.version == version
+
+def test_failed_write_leaves_the_old_file_intact(roles_file, monkeypatch):
+    original = roles_file.read_text()
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(registry_module.os, "replace", fail)
+
+    async def scenario():
+        store = JSONRoleStore(str(roles_file), write_delay=0.01)
+        await store.mutate(lambda roles: roles.__setitem__("trader", role("Trader")))
+        with pytest.raises(OSError):
+            await store.flush()
+        return store
+
+    store = asyncio.run(scenario())
+    assert roles_file.read_text() == original
+    assert os.listdir(roles_file.parent) == ["roles.json"]
+    # The change is kept in memory so a later flush can still write it
+    assert "trader" in store.load()["roles"]
+
+def test_external_edits_are_reloaded(roles_file):
+    store = JSONRoleStore(str(roles_file))
+    version = store.version
+    roles_file.write_text(json.dumps({"roles": {"analyst": role("Analyst"), "critic": role("Critic")}}))
+    assert store.get("critic") == role("Critic")
+    assert store.version != version
+
+@pytest.fixture(params=["json", "sqlite"])
+def store(request, roles_file, tmp_path):
+    if request.param == "sqlite":
+        store = SQLiteRoleStore(str(tmp_path / "roles.db"), seed_file=str(roles_file))
+        yield store
+        store._db.close()
+    else:
+        yield JSONRoleStore(str(roles_file), write_delay=0.01)
+
+def test_stores_apply_the_same_mutations(store):
+    async def scenario():
+        versions = [store.version]
+        assert store.resolve("analyst") == ("analyst", role("Analyst"))
+
+        await store.mutate(lambda roles: roles.__setitem__("risk_officer", role("Risk Officer")))
+        versions.append(store.version)
+        assert store.resolve("Risk Officer") == ("risk_officer", role("Risk Officer"))
+        assert list(store.load()["roles"]) == ["analyst", "risk_officer"]
+
+        await store.mutate(lambda roles: roles.__setitem__("analyst", role("Analyst", temperature=0.2)))
+        versions.append(store.version)
+        assert store.get("analyst") == role("Analyst", temperature=0.2)
+        # Updating a role keeps its place in the list
+        assert list(store.load()["roles"]) == ["analyst", "risk_officer"]
+
+        await store.mutate(lambda roles: roles.pop("analyst"))
+        versions.append(store.version)
+        assert store.get("analyst") is None
+        assert store.resolve("Analyst") is None
+        assert list(store.load()["roles"]) == ["risk_officer"]
+
+        await store.flush()
+        return versions
+
+    versions = asyncio.run(scenario())
+    assert len(set(versions)) == len(versions)
+
+def test_resolution_prefers_key_then_name_then_alias(store):
+    def seed(roles):
+        roles["planner"] = role("Strategist")
+        # Display names that collide with another role's key or name
+        roles["lead"] = role("planner")
+        roles["strategist"] = role("Adviser")
+
+    async def scenario():
+        await store.mutate(seed)
+        await store.flush()
+
+    asyncio.run(scenario())
+    # An exact key beats another role's display name
+    assert store.resolve("planner")[0] == "planner"
+    # A display name beats another role's case-insensitive alias
+    assert store.resolve("Strategist")[0] == "planner"
+    assert store.resolve("strategist")[0] == "strategist"
+    # Aliases ignore case, surrounding spaces and spaces vs underscores
+    assert store.resolve("  ADVISER ")[0] == "strategist"
+    assert store.resolve("Analyst")[0] == "analyst"
+    assert store.resolve("LEAD")[0] == "lead"
+    assert store.resolve("nobody") is None
+
+def test_resolution_follows_mutations(store):
+    async def scenario():
+        await store.mutate(lambda roles: roles.__setitem__("analyst", role("Market Analyst")))
+        assert store.resolve("Market Analyst")[0] == "analyst"
+        assert store.resolve("market_analyst")[0] == "analyst"
+
+        def rename(roles):
+            del roles["analyst"]
+            roles["researcher"] = role("Researcher")
+
+        await store.mutate(rename)
+        assert store.resolve("Market Analyst") is None
+        assert store.resolve("analyst") is None
+        assert store.resolve("RESEARCHER")[0] == "researcher"
+        await store.flush()
+
+    asyncio.run(scenario())
+
+def test_role_store_is_selected_by_environment(tmp_path, monkeypatch):
+    monkeypatch.delenv("ROLE_STORE", raising=False)
+    assert isinstance(create_role_store(), JSONRoleStore)
+    monkeypatch.setenv("ROLE_STORE", "sqlite")
+    monkeypatch.setenv("ROLE_DB_PATH", str(tmp_path / "roles.db"))
+    store = create_role_store()
+    assert isinstance(store, SQLiteRoleStore)
+    # Seeded from the bundled roles.json
+    assert store.load()["roles"]
+    store._db.close()
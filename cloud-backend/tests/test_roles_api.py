@@ -0,0 +1,89 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the parent directory to the Python path so we can import our modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+# Never reach the real API from tests
+os.environ.setdefault("AI_BACKEND", "fake")
+
+from fastapi.testclient import TestClient
+from app import main
+
+ROLES = {
+    key: {"name": name, "description": f"{name} role", "model": "gemini-2.0-flash-lite",
+          "temperature": 0.5, "max_tokens": 200, "system_prompt": f"You are the {name}."}
+    for key, name in [("analyst", "Analyst"), ("critic", "Critic"), ("planner", "Planner"), ("skeptic", "Skeptic")]
+}
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """The app serving a temporary copy of the roles."""
+    path = tmp_path / "roles.json"
+    path.write_text(json.dumps({"roles": ROLES}, indent=2))
+    monkeypatch.setattr(main.role_registry, "path", str(path))
+    with TestClient(main.app) as client:
+        yield client
+
+def test_unchanged_roles_answer_304(client):
+    first = client.get("/api/roles")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert client.get("/api/roles", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/api/roles", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+    assert client.get("/api/roles", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+def test_etag_changes_when_roles_change(client):
+    etag = client.get("/api/roles").headers["ETag"]
+    client.post("/api/roles/delete", params={"role_name": "Critic"}).raise_for_status()
+    response = client.get("/api/roles", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert "critic" not in [role["name"].lower() for role in response.json()["roles"]]
+
+def test_fields_projects_each_role(client):
+    roles = client.get("/api/roles", params={"fields": "name, model"}).json()["roles"]
+    assert roles == [{"name": role["name"], "model": role["model"]} for role in ROLES.values()]
+
+def test_cursor_pages_through_every_role(client):
+    names = []
+    cursor = None
+    pages = 0
+    while True:
+        params = {"limit": 3, "fields": "name"}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/api/roles", params=params).json()
+        names += [role["name"] for role in page["roles"]]
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert pages == 2
+    assert names == [role["name"] for role in ROLES.values()]
+
+def test_cursor_survives_other_changes_but_not_its_own_role(client):
+    cursor = client.get("/api/roles", params={"limit": 2}).json()["next_cursor"]
+    # Removing a role before the cursor does not affect the next page
+    client.post("/api/roles/delete", params={"role_name": "Analyst"}).raise_for_status()
+    page = client.get("/api/roles", params={"limit": 2, "cursor": cursor}).json()
+    assert [role["name"] for role in page["roles"]] == ["Planner", "Skeptic"]
+    # Once the role the cursor points at is gone, the cursor is rejected
+    client.post("/api/roles/delete", params={"role_name": "Critic"}).raise_for_status()
+    assert client.get("/api/roles", params={"limit": 2, "cursor": cursor}).status_code == 400
+
+def test_malformed_cursor_is_rejected(client):
+    response = client.get("/api/roles", params={"limit": 2, "cursor": "%%%not-base64"})
+    assert response.status_code == 400
+    assert "Invalid cursor" in response.json()["detail"]
+
+def test_role_changes_drop_cached_responses(client):
+    cache = main.gemini_service.response_cache
+    cache.set("key", "An analyst's cached reply")
+    role = {**ROLES["analyst"], "system_prompt": "You are a terse analyst."}
+    client.post("/api/roles/update", json=role).raise_for_status()
+    assert cache.get("key") is None
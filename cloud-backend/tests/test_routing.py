@@ -0,0 +1,111 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the parent directory to the Python path so we can import our modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.ai_services.config import AIServiceConfig
+from app.ai_services.fake_backend import FakeGenerativeModel
+from app.ai_services.gemini_service import GeminiService
+from app.ai_services.routing import Route, RoutingService
+from app.metrics import MetricsRegistry
+
+CONFIG = AIServiceConfig(
+    ai_backend="fake",
+    requests_per_minute=100_000,
+    tokens_per_minute=100_000_000,
+    retry_max_attempts=1,
+    coalesce_requests=False,
+    hedge_min_samples=3,
+    hedge_quantile=0.9,
+)
+
+def backend(registry: MetricsRegistry, latency: float = 0.01, quota_error_rate: float = 0.0) -> GeminiService:
+    """A fake-backend service whose model clients answer after ``latency`` seconds."""
+    service = GeminiService(CONFIG, registry=registry)
+    service.models.factory = lambda name, system_instruction=None: FakeGenerativeModel(
+        name, system_instruction, latency=latency, tokens_per_second=1_000_000, quota_error_rate=quota_error_rate, seed=0
+    )
+    return service
+
+def router(primary: GeminiService, secondary: GeminiService, registry: MetricsRegistry, **settings) -> RoutingService:
+    config = CONFIG.model_copy(update={"retry_base_delay": 0.01, **settings})
+    return RoutingService(config, [Route("primary", primary), Route("secondary", secondary, "gemini-x")], registry)
+
+def calls(service: GeminiService) -> int:
+    return sum(client.calls for client in service.models._clients.values())
+
+def test_first_route_serves_while_healthy():
+    registry = MetricsRegistry()
+    primary, secondary = backend(registry), backend(registry)
+    routing = router(primary, secondary, registry)
+    text = asyncio.run(routing.generate_response("hello"))
+    assert text
+    assert (calls(primary), calls(secondary)) == (1, 0)
+    assert registry.get("routing_calls_total").value(route="primary", outcome="won") == 1
+
+def test_quota_error_fails_over_and_benches_the_route():
+    registry = MetricsRegistry()
+    primary, secondary = backend(registry, quota_error_rate=1.0), backend(registry)
+    routing = router(primary, secondary, registry)
+
+    async def scenario():
+        await routing.generate_response("first")
+        await routing.generate_response("second")
+
+    asyncio.run(scenario())
+    # The benched primary is only tried last, so the second call goes straight to the secondary
+    assert (calls(primary), calls(secondary)) == (1, 2)
+    assert routing.stats()["routes"]["primary"]["benched_for"] > 0
+    assert registry.get("routing_failovers_total").value(route="primary", reason="quota") == 1
+    assert registry.get("routing_calls_total").value(route="secondary", outcome="won") == 2
+
+def test_slow_route_is_hedged_and_the_loser_cancelled():
+    registry = MetricsRegistry()
+    primary, secondary = backend(registry, latency=1.0), backend(registry, latency=0.01)
+    routing = router(primary, secondary, registry)
+    for _ in range(3):
+        routing.latencies["primary"].observe(0.02)
+
+    async def scenario():
+        started = asyncio.get_running_loop().time()
+        await routing.generate_response("hedge me")
+        return asyncio.get_running_loop().time() - started
+
+    elapsed = asyncio.run(scenario())
+    assert elapsed < 0.5
+    assert registry.get("routing_hedges_total").value(route="primary") == 1
+    assert registry.get("routing_calls_total").value(route="secondary", outcome="won") == 1
+    assert registry.get("routing_calls_total").value(route="primary", outcome="cancelled") == 1
+
+def test_no_hedging_without_enough_samples():
+    registry = MetricsRegistry()
+    primary, secondary = backend(registry, latency=0.1), backend(registry)
+    routing = router(primary, secondary, registry)
+    asyncio.run(routing.generate_response("not enough samples yet"))
+    assert calls(secondary) == 0
+    assert registry.get("routing_hedges_total").value(route="primary") == 0
+
+def test_all_routes_failing_is_retried_then_raised():
+    registry = MetricsRegistry()
+    primary, secondary = backend(registry, quota_error_rate=1.0), backend(registry, quota_error_rate=1.0)
+    routing = router(primary, secondary, registry, retry_max_attempts=2)
+    with pytest.raises(Exception, match="Simulated quota exhaustion"):
+        asyncio.run(routing.generate_response("nobody can answer"))
+    assert (calls(primary), calls(secondary)) == (2, 2)
+    assert registry.get("gemini_retries_total").value(model=primary.model_name, reason="quota") == 1
+
+def test_streams_from_the_route_that_answers_first():
+    registry = MetricsRegistry()
+    primary, secondary = backend(registry, quota_error_rate=1.0), backend(registry)
+    routing = router(primary, secondary, registry)
+
+    async def scenario():
+        return [chunk async for chunk in routing.stream_response("stream me")]
+
+    chunks = asyncio.run(scenario())
+    assert len(chunks) > 1
+    assert calls(secondary) == 1
@@ -0,0 +1,94 @@
+import asyncio
+import sys
+from pathlib import Path
+
+# Add the parent directory to the Python path so we can import our modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.sessions import InMemorySessionStore, SQLiteSessionStore
+
+def message(role: str, content: str) -> dict:
+    return {"role": role, "content": content}
+
+async def add_turn(store, session_id: str, content: str) -> None:
+    """A turn as the endpoints take it: look the session up, then append under its lock."""
+    session = await store.get(session_id)
+    async with session.lock:
+        session.conversation.append(message("model", content))
+        # Give other requests the chance to evict and reload the session meanwhile
+        await asyncio.sleep(0.01)
+        await store.append(session, [session.conversation[-1]])
+
+def test_in_memory_store_evicts_least_recently_used():
+    async def scenario():
+        store = InMemorySessionStore(max_sessions=2)
+        first = await store.create("first")
+        second = await store.create("second")
+        await store.get(first.id)
+        third = await store.create("third")
+        return store, first, second, third
+
+    store, first, second, third = asyncio.run(scenario())
+    assert asyncio.run(store.get(second.id)) is None
+    assert asyncio.run(store.get(first.id)) is first
+    assert asyncio.run(store.get(third.id)) is third
+
+def test_sessions_persist_across_store_instances(tmp_path):
+    path = str(tmp_path / "sessions.db")
+
+    async def write():
+        store = SQLiteSessionStore(path)
+        session = await store.create("pricing", [message("user", "How should we price it?")])
+        session.conversation.append(message("model", "[Analyst] By value."))
+        await store.append(session, [session.conversation[-1]])
+        return session.id
+
+    async def read(session_id):
+        return await SQLiteSessionStore(path).get(session_id)
+
+    session_id = asyncio.run(write())
+    session = asyncio.run(read(session_id))
+    assert session.topic == "pricing"
+    assert session.conversation.messages == [
+        message("user", "How should we price it?"),
+        message("model", "[Analyst] By value."),
+    ]
+
+def test_evicted_session_is_reloaded_from_the_database(tmp_path):
+    async def scenario():
+        store = SQLiteSessionStore(str(tmp_path / "sessions.db"), max_sessions=1)
+        session_id = (await store.create("first", [message("user", "hello")])).id
+        await store.create("second")
+        return await store.get(session_id)
+
+    session = asyncio.run(scenario())
+    assert session.topic == "first"
+    assert session.conversation.messages == [message("user", "hello")]
+
+def test_concurrent_turns_after_eviction_share_the_session(tmp_path):
+    path = str(tmp_path / "sessions.db")
+
+    async def scenario():
+        store = SQLiteSessionStore(path, max_sessions=1)
+        session = await store.create("busy", [message("user", "start")])
+        first_turn = asyncio.ensure_future(add_turn(store, session.id, "first"))
+        await asyncio.sleep(0)
+        # Evict the session while the first turn still holds it
+        await store.create("other")
+        second_turn = asyncio.ensure_future(add_turn(store, session.id, "second"))
+        await asyncio.gather(first_turn, second_turn)
+        assert await store.get(session.id) is session
+        return session.id
+
+    session_id = asyncio.run(scenario())
+    reloaded = asyncio.run(SQLiteSessionStore(path).get(session_id))
+    assert [m["content"] for m in reloaded.conversation] == ["start", "first", "second"]
+
+def test_delete_removes_the_session(tmp_path):
+    async def scenario():
+        store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+        session = await store.create("doomed")
+        deleted = await store.delete(session.id)
+        return deleted, await store.get(session.id), await store.delete(session.id)
+
+    assert asyncio.run(scenario()) == (True, None, False)
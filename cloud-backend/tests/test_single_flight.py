@@ -0,0 +1,100 @@
+import asyncio
+import sys
+from pathlib import Path
+
+# Add the parent directory to the Python path so we can import our modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.ai_services.single_flight import SingleFlight
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        flights = SingleFlight()
+        calls = []
+
+        async def call():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flights.run("key", call) for _ in range(5)))
+        return flights, calls, results
+
+    flights, calls, results = asyncio.run(scenario())
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert flights.stats() == {"in_flight": 0, "calls": 1, "deduplicated": 4, "abandoned": 0}
+
+def test_different_keys_and_later_calls_are_not_shared():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def call():
+            await asyncio.sleep(0)
+            return object()
+
+        first, other = await asyncio.gather(flights.run("a", call), flights.run("b", call))
+        later = await flights.run("a", call)
+        return flights, first, other, later
+
+    flights, first, other, later = asyncio.run(scenario())
+    assert first is not other and first is not later
+    assert flights.calls == 3
+
+def test_errors_are_shared_by_every_caller():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def call():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream failed")
+
+        return await asyncio.gather(*(flights.run("key", call) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+
+def test_cancelled_caller_leaves_the_call_to_the_others():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def call():
+            await asyncio.sleep(0.05)
+            return "result"
+
+        leaving = asyncio.ensure_future(flights.run("key", call))
+        staying = asyncio.ensure_future(flights.run("key", call))
+        await asyncio.sleep(0.01)
+        leaving.cancel()
+        return flights, await staying, leaving
+
+    flights, result, leaving = asyncio.run(scenario())
+    assert result == "result"
+    assert leaving.cancelled()
+    assert flights.abandoned == 0
+
+def test_call_is_cancelled_when_every_caller_leaves():
+    async def scenario():
+        flights = SingleFlight()
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def call():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        callers = [asyncio.ensure_future(flights.run("key", call)) for _ in range(2)]
+        await started.wait()
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.wait_for(cancelled.wait(), 1)
+        return flights
+
+    flights = asyncio.run(scenario())
+    assert flights.stats()["in_flight"] == 0
+    assert flights.abandoned == 1
@@ -0,0 +1,124 @@
+import asyncio
+import sys
+from pathlib import Path
+
+# Add the parent directory to the Python path so we can import our modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.ai_services.conversation import Conversation
+from app.ai_services.speculation import TurnPrefetcher, rank_next_speakers
+from app.metrics import MetricsRegistry
+
+ROLES = [{"name": "Analyst"}, {"name": "Critic"}, {"name": "Planner"}]
+
+def history(*speakers: str) -> Conversation:
+    conversation = Conversation([{"role": "user", "content": "Discuss the launch"}])
+    for speaker in speakers:
+        conversation.append({"role": "model", "content": f"[{speaker}] A point about the launch."})
+    return conversation
+
+def prompt(role_config) -> str:
+    return "Continue the discussion"
+
+class Generator:
+    """Records speculative generations; each finishes once ``release`` is set."""
+
+    def __init__(self):
+        self.calls = []
+        self.cancelled = []
+        self.release = asyncio.Event()
+
+    async def __call__(self, role_config, role_prompt, context, max_tokens):
+        self.calls.append(role_config["name"])
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled.append(role_config["name"])
+            raise
+        return f"{role_config['name']} speaks after {len(context)} messages"
+
+def prefetcher(generate, has_spare=lambda role: True, **settings) -> TurnPrefetcher:
+    return TurnPrefetcher(generate, has_spare, registry=MetricsRegistry(), **settings)
+
+def test_next_speakers_are_ranked_by_how_long_they_waited():
+    ranked = rank_next_speakers(history("Analyst", "Critic").messages, ROLES)
+    assert [role["name"] for role in ranked] == ["Planner", "Analyst"]
+
+def test_speculated_turn_is_served_on_a_hit():
+    async def scenario():
+        generate = Generator()
+        turns = prefetcher(generate, turns=2)
+        conversation = history("Analyst")
+        assert turns.speculate(conversation, ROLES, prompt, 100) == 2
+        generate.release.set()
+        served = turns.take(conversation, "Critic", "Continue the discussion", 100)
+        text = await served
+        # A different prompt or length is not the same request
+        missed = turns.take(conversation, "Planner", "Something else", 100)
+        return generate, turns, text, missed
+
+    generate, turns, text, missed = asyncio.run(scenario())
+    assert generate.calls == ["Critic", "Planner"]
+    assert text == "Critic speaks after 2 messages"
+    assert missed is None
+    assert turns.outcomes.value(outcome="served") == 1
+
+def test_candidates_are_dropped_when_the_history_moves_on():
+    async def scenario():
+        generate = Generator()
+        turns = prefetcher(generate, turns=2)
+        earlier = history("Analyst")
+        turns.speculate(earlier, ROLES, prompt, 100)
+        await asyncio.sleep(0)
+        later = history("Analyst", "Planner")
+        turns.speculate(later, ROLES, prompt, 100)
+        await asyncio.sleep(0)
+        cancelled = sorted(generate.cancelled)
+        stale = turns.take(earlier, "Critic", "Continue the discussion", 100)
+        # A history that branched off differently does not match either
+        branch = turns.take(history("Analyst", "Critic"), "Critic", "Continue the discussion", 100)
+        return cancelled, turns, stale, branch
+
+    cancelled, turns, stale, branch = asyncio.run(scenario())
+    assert stale is None and branch is None
+    assert cancelled == ["Critic", "Planner"]
+    assert turns.outcomes.value(outcome="discarded") == 2
+    assert turns.stats()["histories"] == 1
+
+def test_nothing_is_speculated_without_spare_quota():
+    async def scenario():
+        generate = Generator()
+        turns = prefetcher(generate, has_spare=lambda role: role["name"] != "Critic", turns=2)
+        started = turns.speculate(history("Analyst"), ROLES, prompt, 100)
+        return generate, turns, started
+
+    generate, turns, started = asyncio.run(scenario())
+    assert started == 1
+    assert generate.calls == ["Planner"]
+    assert turns.outcomes.value(outcome="skipped") == 1
+
+def test_speculation_is_limited_in_flight():
+    async def scenario():
+        generate = Generator()
+        turns = prefetcher(generate, turns=2, max_in_flight=1)
+        started = turns.speculate(history("Analyst"), ROLES, prompt, 100)
+        return turns, started
+
+    turns, started = asyncio.run(scenario())
+    assert started == 1
+    assert turns.outcomes.value(outcome="skipped") == 1
+
+def test_failed_speculation_is_not_served():
+    async def scenario():
+        async def fail(role_config, role_prompt, context, max_tokens):
+            raise RuntimeError("quota")
+
+        turns = prefetcher(fail, turns=1)
+        conversation = history("Analyst")
+        turns.speculate(conversation, ROLES, prompt, 100)
+        await asyncio.sleep(0)
+        return turns, turns.take(conversation, "Critic", "Continue the discussion", 100)
+
+    turns, taken = asyncio.run(scenario())
+    assert taken is None
+    assert turns.outcomes.value(outcome="failed") == 1
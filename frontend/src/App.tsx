@@ -2,11 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { ConversationControlPanel } from './components/ConversationControlPanel';
 import { ConversationDisplay } from './components/ConversationDisplay';
 import { RoleDebugPanel } from './components/RoleDebugPanel';
-
-interface Message {
-  role: string;
-  content: string;
-}
+import { ConversationSocket, Message, StreamEvent } from './conversationSocket';
 
 interface Role {
   name: string;
@@ -24,6 +20,9 @@ interface ConversationSettings {
   active_roles: string[];
 }
 
+// One connection carries every turn; the server pushes deltas and completed turns over it
+const conversationSocket = new ConversationSocket('ws://localhost:5000/ws/conversation');
+
 function App() {
   const [activeView, setActiveView] = useState<'conversation' | 'debug'>('conversation');
   const [messages, setMessages] = useState<Message[]>([]);
@@ -31,12 +30,41 @@ function App() {
   const [roles, setRoles] = useState<Role[]>([]);
   const [currentTopic, setCurrentTopic] = useState<string>('');
   const [currentSettings, setCurrentSettings] = useState<ConversationSettings | null>(null);
+  // Conversation on the socket; the server keeps its settings and transcript
+  const [conversationId, setConversationId] = useState<string | null>(null);
+
+  // Text streamed so far for each role whose turn is still being generated
+  const [streamingTurns, setStreamingTurns] = useState<Record<string, string>>({});
 
   useEffect(() => {
     // Fetch available roles when component mounts
     fetchRoles();
   }, []);
 
+  // Show deltas as growing in-progress turns until the completed message arrives
+  const handleStreamEvent = (event: StreamEvent) => {
+    if (event.type === 'delta' && event.role) {
+      const role = event.role;
+      setStreamingTurns(prev => ({ ...prev, [role]: (prev[role] || '') + event.content }));
+    } else if (event.type === 'message' && event.message) {
+      const message = event.message;
+      const role = message.content.match(/^\[([^\]]+)\]/)?.[1];
+      setMessages(prev => [...prev, message]);
+      if (role !== undefined) {
+        setStreamingTurns(prev => {
+          const next = { ...prev };
+          delete next[role];
+          return next;
+        });
+      }
+    }
+  };
+
+  const displayedMessages: Message[] = [
+    ...messages,
+    ...Object.entries(streamingTurns).map(([role, content]) => ({ role: 'model', content: `[${role}] ${content}` })),
+  ];
+
   const fetchRoles = async () => {
     try {
       const response = await fetch('http://localhost:5000/api/roles');
@@ -53,31 +81,23 @@ function App() {
     setIsLoading(true);
     setCurrentTopic(settings.topic);
     setCurrentSettings(settings);
+    setMessages([]);
+    setStreamingTurns({});
+    const id = `conversation-${Date.now()}`;
+    setConversationId(id);
     try {
-      const response = await fetch('http://localhost:5000/api/ai/conversation', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(settings),
-      });
-
-      if (!response.ok) {
-        throw new Error('Failed to start conversation');
-      }
-
-      const data = await response.json();
-      setMessages(data.conversation);
+      await conversationSocket.start(id, settings, handleStreamEvent);
     } catch (error) {
       console.error('Error starting conversation:', error);
       alert('Failed to start conversation');
     } finally {
+      setStreamingTurns({});
       setIsLoading(false);
     }
   };
 
   const handleUserInput = async (input: string, nextSpeaker?: string) => {
-    if (!currentTopic || !currentSettings) {
+    if (!currentTopic || !currentSettings || !conversationId) {
       alert('Please start a conversation first');
       return;
     }
@@ -85,38 +105,12 @@ function App() {
     console.log('Sending user input:', { input, nextSpeaker, currentTopic, currentSettings });
     setIsLoading(true);
     try {
-      const requestBody = {
-        topic: currentTopic,
-        max_turns: currentSettings.max_turns,
-        max_tokens: currentSettings.max_tokens,
-        active_roles: currentSettings.active_roles,
-        conversation_history: messages,
-        user_input: input,
-        next_speaker: nextSpeaker,
-      };
-      console.log('Request body:', requestBody);
-
-      const response = await fetch('http://localhost:5000/api/ai/conversation', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(requestBody),
-      });
-
-      if (!response.ok) {
-        const errorData = await response.json();
-        console.error('Error response:', errorData);
-        throw new Error(errorData.detail || 'Failed to process user input');
-      }
-
-      const data = await response.json();
-      console.log('Response data:', data);
-      setMessages(prev => [...prev, ...data.conversation]);
+      await conversationSocket.turn(conversationId, input, nextSpeaker, handleStreamEvent);
     } catch (error) {
       console.error('Error processing user input:', error);
       alert('Failed to process user input');
     } finally {
+      setStreamingTurns({});
       setIsLoading(false);
     }
   };
@@ -161,8 +155,24 @@ function App() {
         {activeView === 'conversation' ? (
           <>
             <ConversationControlPanel onStartConversation={handleStartConversation} />
+            {isLoading && conversationId && (
+              <button
+                onClick={() => conversationSocket.cancel(conversationId)}
+                style={{
+                  padding: '0.5rem 1rem',
+                  marginBottom: '1rem',
+                  backgroundColor: '#e53e3e',
+                  color: 'white',
+                  border: 'none',
+                  borderRadius: '0.25rem',
+                  cursor: 'pointer',
+                }}
+              >
+                Stop
+              </button>
+            )}
             <ConversationDisplay 
-              messages={messages} 
+              messages={displayedMessages} 
               isLoading={isLoading} 
               roles={roles}
               onUserInput={handleUserInput}
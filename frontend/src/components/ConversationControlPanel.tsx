@@ -21,7 +21,8 @@ interface ConversationSettings {
 }
 
 export const ConversationControlPanel: React.FC<ConversationControlPanelProps> = ({ onStartConversation }) => {
-  const [roles, setRoles] = useState<Role[]>([]);
+  // Only what the role picker shows, so long system prompts aren't downloaded
+  const [roles, setRoles] = useState<Pick<Role, 'name' | 'description'>[]>([]);
   const [topic, setTopic] = useState('');
   const [maxTurns, setMaxTurns] = useState(3);
   const [maxTokens, setMaxTokens] = useState(500);
@@ -34,7 +35,7 @@ export const ConversationControlPanel: React.FC<ConversationControlPanelProps> =
 
   const fetchRoles = async () => {
     try {
-      const response = await fetch('http://localhost:5000/api/roles');
+      const response = await fetch('http://localhost:5000/api/roles?fields=name,description');
       if (!response.ok) throw new Error('Failed to fetch roles');
       const data = await response.json();
       setRoles(data.roles);
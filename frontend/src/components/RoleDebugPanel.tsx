@@ -7,6 +7,7 @@ interface Role {
   temperature: number;
   max_tokens: number;
   system_prompt?: string;
+  cache_responses?: boolean;
   original_name?: string;
 }
 
@@ -63,6 +64,7 @@ export const RoleDebugPanel: React.FC<RoleDebugPanelProps> = ({ onRolesUpdated }
         temperature: newRole.temperature,
         max_tokens: newRole.max_tokens,
         system_prompt: newRole.system_prompt || '',
+        cache_responses: newRole.cache_responses || false,
       };
 
       // If we're updating an existing role, include the original name
@@ -305,6 +307,17 @@ export const RoleDebugPanel: React.FC<RoleDebugPanelProps> = ({ onRolesUpdated }
             />
           </div>
 
+          <div>
+            <label style={{ display: 'flex', alignItems: 'center', gap: '0.5rem' }}>
+              <input
+                type="checkbox"
+                checked={newRole.cache_responses || false}
+                onChange={(e) => setNewRole({ ...newRole, cache_responses: e.target.checked })}
+              />
+              Cache responses (for deterministic, low-temperature roles)
+            </label>
+          </div>
+
           <div>
             <label style={{ display: 'block', marginBottom: '0.5rem' }}>System Prompt</label>
             <textarea
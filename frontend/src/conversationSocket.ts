@@ -0,0 +1,92 @@
+export interface Message {
+  role: string;
+  content: string;
+}
+
+export interface StreamEvent {
+  id?: string | null;
+  type: 'session' | 'delta' | 'message' | 'done' | 'error' | 'cancelled';
+  session_id?: string;
+  role?: string;
+  content?: string;
+  message?: Message;
+  detail?: string;
+}
+
+interface PendingRun {
+  onEvent: (event: StreamEvent) => void;
+  resolve: () => void;
+  reject: (error: Error) => void;
+}
+
+// One WebSocket shared by every conversation; events are routed back by conversation id
+export class ConversationSocket {
+  private socket: WebSocket | null = null;
+  private connecting: Promise<WebSocket> | null = null;
+  private runs = new Map<string, PendingRun>();
+
+  constructor(private url: string) {}
+
+  private connect(): Promise<WebSocket> {
+    if (this.socket && this.socket.readyState === WebSocket.OPEN) return Promise.resolve(this.socket);
+    if (!this.connecting) {
+      this.connecting = new Promise<WebSocket>((resolve, reject) => {
+        const socket = new WebSocket(this.url);
+        socket.onopen = () => {
+          this.socket = socket;
+          this.connecting = null;
+          resolve(socket);
+        };
+        socket.onerror = () => {
+          this.connecting = null;
+          reject(new Error('Failed to connect to the conversation server'));
+        };
+        socket.onmessage = (message) => this.dispatch(JSON.parse(message.data));
+        socket.onclose = () => {
+          this.socket = null;
+          this.runs.forEach(run => run.reject(new Error('Connection to the conversation server closed')));
+          this.runs.clear();
+        };
+      });
+    }
+    return this.connecting as Promise<WebSocket>;
+  }
+
+  private dispatch(event: StreamEvent) {
+    const run = event.id ? this.runs.get(event.id) : undefined;
+    if (!run) {
+      if (event.type === 'error') console.error('Conversation socket error:', event.detail);
+      return;
+    }
+    if (event.type === 'done' || event.type === 'cancelled') {
+      this.runs.delete(event.id as string);
+      run.resolve();
+    } else if (event.type === 'error') {
+      this.runs.delete(event.id as string);
+      run.reject(new Error(event.detail || 'Conversation failed'));
+    } else {
+      run.onEvent(event);
+    }
+  }
+
+  // Send a start/turn message and resolve once that conversation is done (or cancelled)
+  async run(id: string, message: object, onEvent: (event: StreamEvent) => void): Promise<void> {
+    const socket = await this.connect();
+    return new Promise((resolve, reject) => {
+      this.runs.set(id, { onEvent, resolve, reject });
+      socket.send(JSON.stringify({ ...message, id }));
+    });
+  }
+
+  start(id: string, settings: object, onEvent: (event: StreamEvent) => void) {
+    return this.run(id, { type: 'start', ...settings }, onEvent);
+  }
+
+  turn(id: string, userInput: string | undefined, nextSpeaker: string | undefined, onEvent: (event: StreamEvent) => void) {
+    return this.run(id, { type: 'turn', user_input: userInput, next_speaker: nextSpeaker }, onEvent);
+  }
+
+  cancel(id: string) {
+    this.socket?.send(JSON.stringify({ type: 'cancel', id }));
+  }
+}